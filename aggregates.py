@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed aggregates shared by the analysis tools.
+
+Everything the tools report is reduced once per dataset into histograms and
+group-by arrays, so a tool call costs O(groups) instead of O(rows). All
+aggregates are mergeable: appending reviews only aggregates the new rows and
+adds them in.
+"""
+
+import numpy as np
+
+from review_store import COLUMNS, MISSING, ReviewStore
+from rollups import RollupCube
+from topics import count_tokens, new_counts
+
+
+class Aggregates:
+    """Histograms and group-bys over one ReviewStore
+
+    Per-category arrays are indexed by the store's dictionary codes.
+    """
+
+    def __init__(self, rows, score_counts, thumbs_count, thumbs_sum, thumbs_max, thumbs_nonzero,
+                 length_counts, word_sum, completeness, malformed_at, version_reviews, version_rated,
+                 version_score_sum, user_reviews, user_thumbs, user_rated, user_score_sum,
+                 rollup, tokens):
+        self.rows = rows
+        # Ratings: score_counts[s] reviews with score s
+        self.score_counts = score_counts
+        # Thumbs up over reviews with a valid count
+        self.thumbs_count = thumbs_count
+        self.thumbs_sum = thumbs_sum
+        self.thumbs_max = thumbs_max
+        self.thumbs_nonzero = thumbs_nonzero
+        # Content: length_counts[n] non-empty reviews of n characters
+        self.length_counts = length_counts
+        self.word_sum = word_sum
+        # Non-blank values per column of COLUMNS
+        self.completeness = completeness
+        # Non-blank ``at`` values that are not a valid timestamp
+        self.malformed_at = malformed_at
+        # Per appVersion: all reviews, reviews with a valid score and their score sum
+        self.version_reviews = version_reviews
+        self.version_rated = version_rated
+        self.version_score_sum = version_score_sum
+        # Per userName code: reviews, thumbs sum (valid thumbs), rated reviews and score sum
+        # (rows with both a valid thumbs count and score); int32 except the thumbs sum, so
+        # millions of users cost 20 bytes each
+        self.user_reviews = user_reviews
+        self.user_thumbs = user_thumbs
+        self.user_rated = user_rated
+        self.user_score_sum = user_score_sum
+        # Per day / week / month and appVersion: reviews, scores and thumbs up
+        self.rollup = rollup
+        # Lowercased non-stopword token counts (see topics.new_counts)
+        self.tokens = tokens
+
+    @classmethod
+    def build(cls, store: ReviewStore, tokens: bool = True) -> "Aggregates":
+        """Reduce a store in one pass over each column
+
+        With ``tokens=False`` the content is not tokenized and ``tokens`` is left empty.
+        """
+        n_versions = len(store.version_names)
+        n_users = len(store.user_names)
+
+        valid_score = store.score != MISSING
+        valid_thumbs = store.thumbs != MISSING
+        thumbs = store.thumbs[valid_thumbs]
+        non_empty = store.content_len > 0
+
+        versions = store.version_codes[valid_score]
+        users = store.user_codes
+        rated = valid_thumbs & valid_score
+
+        counts = new_counts()
+        if tokens:
+            count_tokens(store.content, counts)
+
+        return cls(
+            rows=len(store),
+            score_counts=np.bincount(store.score[valid_score], minlength=6).astype(np.int64),
+            thumbs_count=len(thumbs),
+            thumbs_sum=int(thumbs.sum(dtype=np.int64)),
+            thumbs_max=int(thumbs.max()) if len(thumbs) else 0,
+            thumbs_nonzero=int(np.count_nonzero(thumbs)),
+            length_counts=np.bincount(store.content_len[non_empty]).astype(np.int64),
+            word_sum=int(store.word_count[non_empty].sum(dtype=np.int64)),
+            completeness=np.array([np.count_nonzero(store.present & (1 << bit)) for bit in range(len(COLUMNS))],
+                                  dtype=np.int64),
+            malformed_at=int(np.count_nonzero((store.present & (1 << COLUMNS.index('at')) != 0) & np.isnat(store.at))),
+            version_reviews=np.bincount(store.version_codes, minlength=n_versions),
+            version_rated=np.bincount(versions, minlength=n_versions),
+            version_score_sum=np.bincount(versions, weights=store.score[valid_score], minlength=n_versions),
+            user_reviews=np.bincount(users, minlength=n_users).astype(np.int32),
+            user_thumbs=np.bincount(users[valid_thumbs], weights=thumbs, minlength=n_users).astype(np.int64),
+            user_rated=np.bincount(users[rated], minlength=n_users).astype(np.int32),
+            user_score_sum=np.bincount(users[rated], weights=store.score[rated], minlength=n_users).astype(np.int32),
+            rollup=RollupCube.build(store),
+            tokens=counts,
+        )
+
+    def merged(self, other: "Aggregates") -> "Aggregates":
+        """Aggregates of this store's rows followed by ``other``'s (codes in the same tables)"""
+        tokens = self.tokens.copy()
+        tokens.update(other.tokens)
+        return Aggregates(
+            rows=self.rows + other.rows,
+            score_counts=_add(self.score_counts, other.score_counts),
+            thumbs_count=self.thumbs_count + other.thumbs_count,
+            thumbs_sum=self.thumbs_sum + other.thumbs_sum,
+            thumbs_max=max(self.thumbs_max, other.thumbs_max),
+            thumbs_nonzero=self.thumbs_nonzero + other.thumbs_nonzero,
+            length_counts=_add(self.length_counts, other.length_counts),
+            word_sum=self.word_sum + other.word_sum,
+            completeness=self.completeness + other.completeness,
+            malformed_at=self.malformed_at + other.malformed_at,
+            version_reviews=_add(self.version_reviews, other.version_reviews),
+            version_rated=_add(self.version_rated, other.version_rated),
+            version_score_sum=_add(self.version_score_sum, other.version_score_sum),
+            user_reviews=_add(self.user_reviews, other.user_reviews),
+            user_thumbs=_add(self.user_thumbs, other.user_thumbs),
+            user_rated=_add(self.user_rated, other.user_rated),
+            user_score_sum=_add(self.user_score_sum, other.user_score_sum),
+            rollup=self.rollup.merged(other.rollup),
+            tokens=tokens,
+        )
+
+    def add(self, other: "Aggregates") -> None:
+        """Add ``other``'s rows into these aggregates in place (codes in the same tables)
+
+        The streaming counterpart of merged: token counts are updated in place
+        and the arrays are only reallocated, with spare room, when a category
+        table outgrows them. Call ``trim`` once the last rows are added.
+        """
+        self.tokens.update(other.tokens)
+        self.rows += other.rows
+        self.score_counts += other.score_counts
+        self.thumbs_count += other.thumbs_count
+        self.thumbs_sum += other.thumbs_sum
+        self.thumbs_max = max(self.thumbs_max, other.thumbs_max)
+        self.thumbs_nonzero += other.thumbs_nonzero
+        self.word_sum += other.word_sum
+        self.completeness += other.completeness
+        self.malformed_at += other.malformed_at
+        for name in GROWING_ARRAYS:
+            setattr(self, name, _add_into(getattr(self, name), getattr(other, name)))
+        self.rollup = self.rollup.merged(other.rollup)
+
+    def trim(self, store: ReviewStore) -> None:
+        """Drop the spare room ``add`` left, so the arrays match ``store``'s tables again"""
+        for name in GROWING_ARRAYS[1:]:
+            size = len(store.user_names) if name.startswith('user_') else len(store.version_names)
+            values = getattr(self, name)
+            if len(values) > size:
+                setattr(self, name, values[:size].copy())
+        self.length_counts = np.trim_zeros(self.length_counts, 'b')
+
+
+def histogram_median(counts: np.ndarray):
+    """Median of the values described by ``counts[value]``, with statistics.median semantics"""
+    n = int(counts.sum())
+    cumulative = np.cumsum(counts)
+    upper = int(np.searchsorted(cumulative, n // 2, side='right'))
+    if n % 2:
+        return upper
+    lower = int(np.searchsorted(cumulative, n // 2 - 1, side='right'))
+    return (lower + upper) / 2
+
+
+# Arrays that Aggregates.add grows as new lengths, versions and users appear (length_counts first)
+GROWING_ARRAYS = ['length_counts', 'version_reviews', 'version_rated', 'version_score_sum',
+                  'user_reviews', 'user_thumbs', 'user_rated', 'user_score_sum']
+
+
+def _add_into(total: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """``total`` with ``values`` added in place, reallocated with twice the room if it is too short"""
+    if len(total) < len(values):
+        grown = np.zeros(max(len(values), 2 * len(total)), dtype=total.dtype)
+        grown[:len(total)] = total
+        total = grown
+    total[:len(values)] += values
+    return total
+
+
+def _add(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise sum of two arrays, padding the shorter with zeros"""
+    if len(a) < len(b):
+        a, b = b, a
+    total = a.copy()
+    total[:len(b)] += b
+    return total
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of data loading, the MCP tools and the Streamlit helpers.
+
+For each size a synthetic reviews CSV with the columns of config.CSV_COLUMNS
+is generated (once, deterministically, into --data-dir) and a fresh Python
+process is run against it:
+
+    import        importing main.py, after which the server can answer MCP requests
+    startup       importing main.py until its background load of the data (with no
+                  snapshot: parse, snapshot, analyses) is ready
+    cache_build   main.build_dataset() after deleting the snapshot
+    load          main.build_dataset() with the snapshot in place
+    tools         each analysis tool of main.py, result cache disabled
+    streamlit     the CSV load and each get_* helper of streamlit_app.py
+                  (skipped when streamlit is not installed)
+
+Every step reports wall time (best and median of --repeat runs), peak RSS
+and, from one extra run under tracemalloc, the peak and net bytes it
+allocated. Results are written as JSON so runs on different commits can be
+compared:
+
+    python benchmark.py --rows 10000 100000 --output before.json
+    python benchmark.py --rows 10000 100000 --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Rows generated and written per chunk, so large files never sit in memory
+GENERATE_CHUNK_ROWS = 200_000
+
+# (tool, arguments) timed in main.py
+TOOLS = [
+    ("review_score_distribution", {}),
+    ("sentiment_analysis", {}),
+    ("top_reviewers", {}),
+    ("version_analysis", {}),
+    ("thumbs_up_analysis", {}),
+    ("content_length_analysis", {}),
+    ("common_topics", {}),
+    ("rating_by_version", {}),
+    ("review_trends", {}),
+    ("user_engagement_score", {}),
+    ("review_completeness", {}),
+    ("keyword_sentiment_analysis", {"keyword": "crash"}),
+]
+
+# Synthetic review text: lexicon words so sentiment has hits, plus filler
+FILLER_WORDS = [
+    'netflix', 'app', 'show', 'shows', 'movie', 'movies', 'series', 'episode', 'watch', 'watching',
+    'streaming', 'crash', 'crashes', 'update', 'login', 'price', 'subscription', 'download', 'screen',
+    'quality', 'buffering', 'account', 'profile', 'content', 'kids', 'phone', 'tablet', 'tv', 'the',
+    'and', 'it', 'is', 'to', 'my', 'this', 'but', 'not', 'after', 'when', 'every', 'time',
+]
+WORDS = np.array(sorted(config.POSITIVE_KEYWORDS | config.NEGATIVE_KEYWORDS) + FILLER_WORDS)
+VERSIONS = np.array([f"{major}.{minor}.{patch} build {build} {50000 + 7 * major + minor}"
+                     for major in range(7, 9) for minor in range(0, 130, 3) for patch, build in ((0, 1), (1, 4))])
+FIRST_REVIEW = np.datetime64('2019-01-01T00:00:00')
+LAST_REVIEW = np.datetime64('2024-06-01T00:00:00')
+
+
+def generate(path: Path, rows: int, seed: int = 0) -> None:
+    """Write ``rows`` synthetic reviews to ``path``; the same arguments give the same file"""
+    tmp = path.with_name(path.name + ".part")
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        for chunk, start in enumerate(range(0, rows, GENERATE_CHUNK_ROWS)):
+            rng = np.random.default_rng([seed, chunk])
+            frame = _synthetic_frame(rng, start, min(GENERATE_CHUNK_ROWS, rows - start))
+            frame.to_csv(f, header=chunk == 0, index=False, lineterminator='\n')
+    os.replace(tmp, path)
+
+
+def _synthetic_frame(rng: np.random.Generator, start: int, n: int) -> pd.DataFrame:
+    # A few very active users and a long tail
+    users = np.minimum(rng.zipf(1.4, n), 5_000_000)
+    scores = rng.choice(np.array(['1', '2', '3', '4', '5', '']), n, p=[0.3, 0.1, 0.1, 0.15, 0.347, 0.003])
+    thumbs = rng.geometric(0.25, n) - 1
+    thumbs[rng.random(n) < 0.001] *= 500
+    versions = VERSIONS[np.minimum(rng.geometric(0.04, n) - 1, len(VERSIONS) - 1)]
+    versions[rng.random(n) < 0.15] = ''
+    span = int((LAST_REVIEW - FIRST_REVIEW).astype(np.int64))
+    at = np.char.replace(np.datetime_as_string(FIRST_REVIEW + rng.integers(0, span, n), unit='s'), 'T', ' ')
+    at[rng.random(n) < 0.0005] = 'N/A'
+
+    lengths = rng.integers(0, 40, n)
+    lengths[rng.random(n) < 0.05] = 0
+    words = WORDS[rng.integers(0, len(WORDS), (n, 40))]
+    content = [' '.join(row[:length]) for row, length in zip(words.tolist(), lengths.tolist())]
+
+    return pd.DataFrame({
+        'reviewId': np.char.add('bench-', np.arange(start, start + n).astype(str)),
+        'userName': np.char.add('user', users.astype(str)),
+        'content': content,
+        'score': scores,
+        'thumbsUpCount': thumbs.astype(str),
+        'reviewCreatedVersion': versions,
+        'at': at,
+        'appVersion': versions,
+    }, columns=config.CSV_COLUMNS)
+
+
+def _reset_peak_rss() -> None:
+    """Restart peak RSS tracking (Linux); elsewhere the peak is the process high-water mark"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss() -> int:
+    """Peak resident set size in bytes since the last reset, None where unknown"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(func, repeat: int = 1, allocations: bool = True) -> dict:
+    """Wall time, peak RSS and (from one more traced run) allocated bytes of ``func()``"""
+    times = []
+    _reset_peak_rss()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    result = {'wall_s': min(times), 'wall_median_s': statistics.median(times), 'runs': repeat,
+              'peak_rss_bytes': _peak_rss()}
+    if allocations:
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result.update(alloc_peak_bytes=peak, alloc_net_bytes=current)
+    return result
+
+
+def _call(func, arguments: dict):
+    """Call a tool; offloaded tools return a coroutine that is run to completion"""
+    result = func(**arguments)
+    return asyncio.run(result) if inspect.iscoroutine(result) else result
+
+
+def run_child(repeat: int, allocations: bool) -> dict:
+    """Benchmark the CSV named by the DATA_FILE environment variable in this process"""
+    results = {}
+    cache_dir = Path(os.environ['CACHE_FILE'])
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    import fastmcp  # noqa: F401 - imported up front so startup times the data, not the imports
+
+    _reset_peak_rss()
+    started = time.perf_counter()
+    import main
+    results['import'] = {'wall_s': time.perf_counter() - started, 'runs': 1}
+    results['rows'] = len(main.DATASET.current().store)
+    results['startup'] = {'wall_s': time.perf_counter() - started, 'runs': 1, 'peak_rss_bytes': _peak_rss()}
+
+    def cache_build():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        main.build_dataset()
+
+    results['cache_build'] = measure(cache_build, 1, allocations)
+    results['load'] = measure(main.build_dataset, repeat, allocations)
+
+    main.DATASET.swap(main.build_dataset())
+    main.RESULTS.enabled = False
+    results['tools'] = {}
+    for name, arguments in TOOLS:
+        tool = getattr(main, name)
+        results['tools'][name] = measure(lambda: _call(tool, arguments), repeat, allocations)
+        sys.stderr.write(f"[BENCH]   {name}: {results['tools'][name]['wall_s'] * 1000:.1f} ms\n")
+
+    try:
+        import streamlit_app
+    except ImportError as e:
+        results['streamlit'] = {'skipped': str(e)}
+        return results
+    results['streamlit'] = {'load_netflix_csv': measure(streamlit_app.load_netflix_csv, 1, False)}
+    for tool, helper in streamlit_app.LOCAL_ANALYSES.items():
+        arguments = dict(TOOLS)[tool]
+        results['streamlit'][helper.__name__] = measure(lambda: helper(**arguments), repeat, allocations)
+    return results
+
+
+def run_size(rows: int, data_dir: Path, repeat: int, allocations: bool) -> dict:
+    """Generate (if needed) and benchmark the ``rows``-row dataset in a fresh process"""
+    data_file = data_dir / f"reviews_{rows}.csv"
+    if not data_file.exists():
+        sys.stderr.write(f"[BENCH] Generating {data_file} ...\n")
+        generated = measure(lambda: generate(data_file, rows), 1, False)
+    else:
+        generated = None
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as work:
+        result_file = Path(work) / "result.json"
+        env = dict(os.environ, DATA_FILE=str(data_file.resolve()), CACHE_FILE=str(Path(work) / "cache"))
+        command = [sys.executable, str(Path(__file__).resolve()), "--child", str(result_file),
+                   "--repeat", str(repeat)] + ([] if allocations else ["--no-allocations"])
+        sys.stderr.write(f"[BENCH] {rows:,} rows ...\n")
+        subprocess.run(command, env=env, check=True, cwd=Path(__file__).parent)
+        with open(result_file, encoding='utf-8') as f:
+            result = json.load(f)
+    result['generate'] = generated
+    result['csv_bytes'] = data_file.stat().st_size
+    return result
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timings(report: dict) -> dict:
+    """{(rows, step): best wall time} of a report"""
+    timings = {}
+    for rows, result in report['sizes'].items():
+        for step in ('import', 'startup', 'cache_build', 'load'):
+            if result.get(step):
+                timings[rows, step] = result[step]['wall_s']
+        for group in ('tools', 'streamlit'):
+            for name, values in result.get(group, {}).items():
+                if isinstance(values, dict) and 'wall_s' in values:
+                    timings[rows, f"{group}.{name}"] = values['wall_s']
+    return timings
+
+
+def compare(baseline: dict, report: dict) -> None:
+    """Print the wall time of every step next to its baseline"""
+    before, after = _timings(baseline), _timings(report)
+    print(f"{'rows':>10} {'step':<44} {'before ms':>11} {'after ms':>11} {'ratio':>7}", file=sys.stderr)
+    for key in sorted(set(before) & set(after), key=lambda key: (int(key[0]), key[1])):
+        ratio = after[key] / before[key] if before[key] else float('inf')
+        print(f"{key[0]:>10} {key[1]:<44} {before[key] * 1000:>11.1f} {after[key] * 1000:>11.1f} {ratio:>7.2f}",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per step (load and calls)")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "netflix-benchmark",
+                        help="where generated CSVs are kept between runs")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", type=Path, help="JSON report of an earlier run to compare against")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_result = run_child(args.repeat, not args.no_allocations)
+        with open(args.child, 'w', encoding='utf-8') as f:
+            json.dump(child_result, f)
+        sys.exit(0)
+
+    args.data_dir.mkdir(parents=True, exist_ok=True)
+    report = {
+        'commit': _commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'sizes': {str(rows): run_size(rows, args.data_dir, args.repeat, not args.no_allocations) for rows in args.rows},
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding='utf-8')
+    else:
+        print(text)
+    if args.compare:
+        compare(json.loads(args.compare.read_text(encoding='utf-8')), report)
@@ -7,18 +7,27 @@ import os
 from pathlib import Path
 
 # ============= FILE CONFIGURATION =============
-DATA_FILE = Path("netflix_data.csv")
-CACHE_FILE = Path("netflix_cache.json")
+# Relative to the project directory; the DATA_FILE / CACHE_FILE environment variables override them
+DATA_FILE = Path(os.environ.get("DATA_FILE", "netflix_data.csv"))
+CACHE_FILE = Path(os.environ.get("CACHE_FILE", "netflix_cache"))  # Binary columnar snapshot directory
+INGEST_DIR = Path(os.environ.get("INGEST_DIR", "ingest"))  # ingest_reviews only reads CSVs inside this directory
 
 # ============= SERVER CONFIGURATION =============
 MCP_SERVER_NAME = "Netflix Data Analyzer"
 MCP_PORT = 8000
 MCP_HOST = "localhost"
+MCP_TRANSPORT = "stdio"  # "stdio", "http" (streamable HTTP) or "sse"
+TOOL_WORKERS = 4  # Threads running the heavy analysis tools
+RESPONSE_FORMAT = "text"  # Default tool output: "text" (decorated) or "json" (compact JSON + structured content)
 
 # ============= ANALYSIS CONFIGURATION =============
 # Number of results to return for top-k analyses
 TOP_K_RESULTS = 10
 
+# rating_by_version ranks versions by a Bayesian average: the overall average
+# rating counts as this many extra ratings of every version
+RATING_PRIOR_WEIGHT = 50
+
 # Stopwords for keyword analysis
 STOPWORDS = {
     'the', 'a', 'an', 'and', 'or', 'but', 'is', 'it', 'to', 'of', 'in', 'for', 'on', 'with',
@@ -27,6 +36,13 @@ STOPWORDS = {
     'just', 'more', 'one', 'two', 'like', 'love', 'good', 'bad', 'netflix'
 }
 
+# Token counting for common_topics: "exact" counts every token, "approximate"
+# keeps memory fixed with a Count-Min Sketch plus the TOPICS_TOP_K most frequent tokens
+TOPICS_MODE = "exact"
+TOPICS_SKETCH_WIDTH = 2 ** 18  # Counters per sketch row
+TOPICS_SKETCH_DEPTH = 4  # Sketch rows (independent hashes)
+TOPICS_TOP_K = 1000  # Candidate tokens tracked in approximate mode
+
 # Sentiment analysis keywords
 POSITIVE_KEYWORDS = {
     'love', 'great', 'excellent', 'amazing', 'perfect', 'good', 'best', 'awesome',
@@ -57,7 +73,10 @@ APP_DESCRIPTION = "Interactive AI Assistant for Netflix Reviews Analysis"
 RESOURCES = {
     "netflix://data/overview": "Dataset overview",
     "netflix://data/structure": "Data schema and structure",
-    "netflix://analysis/summary": "Available analysis summary"
+    "netflix://analysis/summary": "Available analysis summary",
+    "netflix://cache/stats": "Tool result cache statistics",
+    "netflix://metrics": "Per-tool call metrics",
+    "netflix://metrics/prometheus": "Call metrics in Prometheus text format"
 }
 
 # ============= TOOLS =============
@@ -73,7 +92,9 @@ TOOLS = {
     "review_trends": "Analyze review trends over time",
     "user_engagement_score": "Calculate user engagement metrics",
     "review_completeness": "Analyze data completeness",
-    "keyword_sentiment_analysis": "Analyze sentiment for keywords"
+    "keyword_sentiment_analysis": "Analyze sentiment for keywords",
+    "run_analyses": "Run several analyses on one filter in one call",
+    "ingest_reviews": "Append new reviews from a CSV file"
 }
 
 # ============= CSV COLUMNS =============
@@ -95,6 +116,14 @@ JSON_ENCODING = 'utf-8'
 # ============= CACHE SETTINGS =============
 ENABLE_CACHE = True
 CACHE_EXPIRY_HOURS = 24  # Cache expires after 24 hours
+RESULT_CACHE_MAX_ENTRIES = 256  # Tool results kept in memory
+RESULT_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Total size of cached tool results
+
+# ============= METRICS =============
+ENABLE_METRICS = True  # Per-tool latency, rows and result size (netflix://metrics); off costs one flag check per call
+
+# ============= HOT RELOAD =============
+RELOAD_POLL_SECONDS = 5  # How often the MCP server checks DATA_FILE for a new dump
 
 # ============= LOGGING =============
 LOG_LEVEL = "INFO"  # "DEBUG", "INFO", "WARNING", "ERROR"
@@ -102,7 +131,11 @@ LOG_FILE = "netflix_analyzer.log"
 
 # ============= PERFORMANCE =============
 MAX_RESULTS_PER_QUERY = 1000  # Limit results to prevent memory issues
-BATCH_SIZE = 1000  # Process data in batches
+BATCH_SIZE = 50_000  # Rows per CSV chunk in streaming mode
+STREAMING = False  # Build the dataset from BATCH_SIZE-row CSV chunks instead of parsing the whole file
+SHARD_WORKERS = os.cpu_count() or 1  # Processes building the text analyses of a large dataset
+SHARD_MIN_ROWS = 200_000  # Smaller datasets are analyzed in-process
+FILTER_VIEW_CACHE_SIZE = 8  # Filtered views (rows and their aggregates) kept per dataset for reuse by later calls
 
 # ============= DATABASE (Optional - for future use) =============
 USE_DATABASE = False
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Live dataset holder for the MCP server.
+
+Tools fetch the current Dataset once per call and use only that object, so a
+reload that swaps in a new one never changes data under a running tool.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import cached_property
+from typing import Callable, Optional
+
+import numpy as np
+
+import config
+from aggregates import Aggregates
+from filters import FilteredView, FilterIndex, ReviewFilter
+from review_store import ReviewStore
+from sentiment import store_flags
+from text_index import InvertedIndex
+from topics import TokenTable
+from versions import VersionIndex
+
+
+class Dataset:
+    """An immutable, versioned snapshot of the reviews served to tools
+
+    Aggregates, the keyword index, the per-row sentiment lexicon flags and the
+    token frequency table are computed here, when the dataset is built, so a
+    reload pays for them in the background before the dataset is swapped in.
+    """
+
+    def __init__(self, store: ReviewStore, source: Optional[dict], aggregates: Aggregates = None,
+                 index: InvertedIndex = None, sentiment: np.ndarray = None):
+        self.store = store
+        self.source = source
+        self.aggregates = aggregates if aggregates is not None else Aggregates.build(store)
+        self.index = index if index is not None else InvertedIndex.build(store)
+        self.sentiment = sentiment if sentiment is not None else store_flags(store, self.index)
+        self.topics = TokenTable.from_counts(self.aggregates.tokens)
+        self.loaded_at = datetime.now()
+        # Number of the DatasetManager swap that made this dataset current (0: never swapped in)
+        self.generation = 0
+        # Recently used filtered views, least recently used first
+        self._views = OrderedDict()
+        self._views_lock = threading.Lock()
+
+    @cached_property
+    def version(self) -> str:
+        """Short identity of the source file the store was built from
+        
+        Hashes the whole fingerprint: the sampled hash alone misses edits in the
+        middle of the file, while those still change its size or mtime.
+        """
+        if not self.source:
+            return "unknown"
+        fingerprint = json.dumps(self.source, sort_keys=True).encode('utf-8')
+        return hashlib.blake2b(fingerprint, digest_size=6).hexdigest()
+
+    @cached_property
+    def filters(self) -> FilterIndex:
+        """Sorted and grouped row orders for tool filters, built on first use"""
+        return FilterIndex(self.store, self.versions)
+
+    @cached_property
+    def versions(self) -> VersionIndex:
+        """appVersion codes in semantic version order with their rollup groups, built on first use"""
+        return VersionIndex(self.store.version_names)
+
+    def filtered(self, filter: Optional[ReviewFilter]):
+        """This dataset, or a FilteredView of its rows matching ``filter`` when it sets a condition
+
+        The last FILTER_VIEW_CACHE_SIZE views are reused, so tools called one
+        after another with the same filter select and aggregate its rows once.
+        """
+        key = json.dumps(filter, sort_keys=True)
+        with self._views_lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        rows = self.filters.select(filter, self.index)
+        if rows is None:
+            return self
+        view = FilteredView(self, filter, rows)
+        with self._views_lock:
+            # A concurrent call may have built the same view; keep the first
+            view = self._views.setdefault(key, view)
+            while len(self._views) > config.FILTER_VIEW_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+
+class DatasetManager:
+    """Holds the current Dataset and rebuilds it when the source file changes"""
+
+    def __init__(self, initial: Optional[Dataset], loader: Callable[[], Dataset], path, poll_seconds: float = 5.0,
+                 startup: Optional[Callable[[], Dataset]] = None):
+        """``loader`` builds a fresh Dataset from ``path`` and raises if it cannot
+
+        Without ``initial``, the first dataset comes from ``startup`` (which must
+        not raise), run by ``load_in_background`` or else by the first ``current`` call.
+        """
+        self._loader = loader
+        self._startup = startup
+        self._loading = None
+        self._path = path
+        self._poll_seconds = poll_seconds
+        # Held while a new dataset is built from the current one, so reloads and appends never interleave
+        self.lock = threading.RLock()
+        self._dataset = None
+        self._swaps = 0
+        # Set once there is a dataset to serve
+        self._ready = threading.Event()
+        if initial is not None:
+            self.swap(initial)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def current(self) -> Dataset:
+        """Dataset to use for the whole of one tool call; waits for the first one to be loaded"""
+        if not self._ready.is_set():
+            self.load_in_background()
+            self._ready.wait()
+        return self._dataset
+
+    def identity(self) -> str:
+        """Key of the current dataset for cached results: its version and swap number
+        
+        Changes on every swap, even when a reload finds the same source fingerprint.
+        """
+        dataset = self.current()
+        return f"{dataset.version}.{dataset.generation}"
+
+    def swap(self, dataset: Dataset) -> None:
+        """Make ``dataset`` current; callers building it from the current one hold ``lock``"""
+        self._swaps += 1
+        dataset.generation = self._swaps
+        # A single reference assignment: readers see the old or the new dataset, never a mix
+        self._dataset = dataset
+        self._ready.set()
+
+    def load_in_background(self) -> Optional[threading.Thread]:
+        """Build the first dataset with ``startup`` in a daemon thread, unless that has begun already"""
+        with self.lock:
+            if self._loading is not None or self._ready.is_set() or self._startup is None:
+                return self._loading
+
+            def run():
+                with self.lock:
+                    self.swap(self._startup())
+
+            self._loading = threading.Thread(target=run, name="dataset-loader", daemon=True)
+            self._loading.start()
+        return self._loading
+
+    def reload(self) -> Dataset:
+        """Build a new dataset and swap it in once it is complete"""
+        with self.lock:
+            dataset = self._loader()
+            self.swap(dataset)
+        return dataset
+
+    def _source_stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _is_current(self, stat: tuple) -> bool:
+        source = self._dataset.source
+        return bool(source) and (source['size'], source['mtime_ns']) == stat
+
+    def start_watcher(self) -> threading.Thread:
+        """Poll the source file in a daemon thread and reload when it changes"""
+        thread = threading.Thread(target=self._watch, name="dataset-watcher", daemon=True)
+        thread.start()
+        return thread
+
+    def _watch(self) -> None:
+        self._ready.wait()
+        previous = self._source_stat()
+        failed = None
+        while True:
+            time.sleep(self._poll_seconds)
+            stat = self._source_stat()
+            # Reload only once the file has stopped changing between two polls,
+            # so a dump that is still being copied in is not half-read
+            if stat is not None and stat == previous and stat != failed and not self._is_current(stat):
+                sys.stderr.write(f"[RELOAD] {self._path} changed, rebuilding dataset...\n")
+                try:
+                    dataset = self.reload()
+                    failed = None
+                    sys.stderr.write(f"[RELOAD] Now serving dataset {dataset.version} ({len(dataset.store):,} reviews)\n")
+                except Exception as e:
+                    # Not retried until the file changes again
+                    failed = stat
+                    sys.stderr.write(f"[RELOAD] Reload failed, keeping current dataset: {e}\n")
+            previous = stat
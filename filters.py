@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Row filters for the analysis tools.
+
+Every tool takes an optional ``filter`` (see ReviewFilter). A filter is answered
+from indexes built once per dataset rather than by scanning columns. The rows
+are kept in sorted order of ``at``, ``score`` and ``thumbsUpCount``, so a date
+range, a score set or a thumbs minimum becomes a few binary searches. Rows are
+also grouped by appVersion code, so a version prefix or a semantic version
+range (see versions.VersionIndex) selects whole groups. A keyword goes through the inverted index. The most selective condition supplies
+the candidate rows, and the other conditions are checked on those candidates
+only.
+"""
+
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+from typing_extensions import TypedDict
+
+from aggregates import Aggregates
+from review_store import ReviewStore
+from text_index import InvertedIndex
+from topics import TokenTable, count_tokens, new_counts
+from versions import VersionIndex
+
+# int64 value of NaT; undated rows sort first in the ``at`` order
+_NAT = np.iinfo(np.int64).min
+
+
+class ReviewFilter(TypedDict, total=False):
+    """Reviews an analysis covers; every condition given must hold
+
+    start_date / end_date: ISO dates or datetimes, both inclusive at their own
+        precision ("2023-05" ends with the last second of May)
+    scores: ratings to keep, e.g. [1, 2]
+    version_prefix: appVersion starts with this, e.g. "8."
+    version_since / version_until: appVersion within this semantic version
+        range, both inclusive at their own precision ("8.100" to "8" is every
+        8.x from 8.100 on)
+    min_thumbs: at least this many thumbs up
+    keyword: content contains this (case-insensitive)
+    """
+    start_date: str
+    end_date: str
+    scores: list[int]
+    version_prefix: str
+    version_since: str
+    version_until: str
+    min_thumbs: int
+    keyword: str
+
+
+def date_bounds(filter: Optional[ReviewFilter]) -> tuple:
+    """(start, stop) of the filter's date range as datetime64[s], stop exclusive; None where open"""
+    filter = filter or {}
+    start = stop = None
+    try:
+        if filter.get('start_date'):
+            start = np.datetime64(filter['start_date']).astype('datetime64[s]')
+        if filter.get('end_date'):
+            # One unit past the end at its own precision: a date includes its whole day
+            stop = (np.datetime64(filter['end_date']) + 1).astype('datetime64[s]')
+    except ValueError as e:
+        raise ValueError(f"Invalid date in filter: {e}") from None
+    return start, stop
+
+
+def versions_matching(version_names, prefix: str) -> np.ndarray:
+    """Boolean mask over appVersion codes whose name starts with ``prefix``"""
+    return np.array([name.startswith(prefix) for name in version_names], dtype=bool)
+
+
+def version_mask(versions: VersionIndex, filter: Optional[ReviewFilter]) -> Optional[np.ndarray]:
+    """Boolean mask over appVersion codes allowed by the filter's version conditions, or None without any"""
+    filter = filter or {}
+    mask = None
+    if filter.get('version_prefix') is not None:
+        mask = versions_matching(versions.names, filter['version_prefix'])
+    since, until = filter.get('version_since'), filter.get('version_until')
+    if since or until:
+        in_range = versions.range(since or None, until or None)
+        mask = in_range if mask is None else mask & in_range
+    return mask
+
+
+def describe(filter: Optional[ReviewFilter]) -> str:
+    """One-line summary of the conditions of ``filter``"""
+    return ", ".join(f"{key}={value!r}" for key, value in (filter or {}).items() if value not in (None, '', []))
+
+
+class FilterIndex:
+    """Row orders of one store that let filters select rows without scanning them"""
+
+    def __init__(self, store: ReviewStore, versions: VersionIndex):
+        self.store = store
+        self.versions = versions
+        self.at = store.at.view(np.int64)
+        self.at_order = np.argsort(self.at, kind='stable').astype(np.int32)
+        self.at_sorted = self.at[self.at_order]
+        self.score_order = np.argsort(store.score, kind='stable').astype(np.int32)
+        self.score_sorted = store.score[self.score_order]
+        self.thumbs_order = np.argsort(store.thumbs, kind='stable').astype(np.int32)
+        self.thumbs_sorted = store.thumbs[self.thumbs_order]
+        # Rows of appVersion code c: version_rows[version_indptr[c]:version_indptr[c + 1]]
+        self.version_rows = np.argsort(store.version_codes, kind='stable').astype(np.int32)
+        self.version_indptr = np.zeros(len(store.version_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(store.version_codes, minlength=len(store.version_names)),
+                  out=self.version_indptr[1:])
+
+    def select(self, filter: Optional[ReviewFilter], index: InvertedIndex) -> Optional[np.ndarray]:
+        """Sorted ids of the rows matching ``filter``, or None when it sets no condition"""
+        unknown = set(filter or {}) - set(ReviewFilter.__annotations__)
+        if unknown:
+            raise ValueError(f"Unknown filter keys: {', '.join(sorted(unknown))}")
+        conditions = self._conditions(filter or {}, index)
+        if not conditions:
+            return None
+
+        # Candidates come from the most selective index; the rest only test them
+        conditions.sort(key=lambda condition: condition[0])
+        _, candidates, _ = conditions[0]
+        rows = np.sort(candidates())
+        for _, _, test in conditions[1:]:
+            rows = rows[test(rows)]
+        return rows
+
+    def _conditions(self, filter: ReviewFilter, index: InvertedIndex) -> list:
+        """(estimated rows, candidate rows thunk, row test) per condition set in ``filter``"""
+        conditions = [
+            self._date_condition(*date_bounds(filter)),
+            self._score_condition(filter.get('scores')),
+            self._thumbs_condition(filter.get('min_thumbs')),
+            self._version_condition(version_mask(self.versions, filter)),
+            self._keyword_condition(filter.get('keyword'), index),
+        ]
+        return [condition for condition in conditions if condition is not None]
+
+    def _date_condition(self, start, stop):
+        if start is None and stop is None:
+            return None
+        low = start.astype(np.int64) if start is not None else _NAT + 1
+        lo = np.searchsorted(self.at_sorted, low, side='left')
+        if stop is None:
+            high = np.iinfo(np.int64).max
+            hi = len(self.at_sorted)
+        else:
+            high = stop.astype(np.int64)
+            hi = np.searchsorted(self.at_sorted, high, side='left')
+        return (hi - lo, lambda: self.at_order[lo:hi],
+                lambda rows: (self.at[rows] >= low) & (self.at[rows] < high))
+
+    def _score_condition(self, scores):
+        if not scores:
+            return None
+        scores = sorted({int(score) for score in scores})
+        bounds = [(np.searchsorted(self.score_sorted, score, side='left'),
+                   np.searchsorted(self.score_sorted, score, side='right')) for score in scores]
+        return (sum(hi - lo for lo, hi in bounds),
+                lambda: np.concatenate([self.score_order[lo:hi] for lo, hi in bounds]),
+                lambda rows: np.isin(self.store.score[rows], scores))
+
+    def _thumbs_condition(self, min_thumbs):
+        if min_thumbs is None:
+            return None
+        # Missing counts are negative and never pass
+        minimum = max(int(min_thumbs), 0)
+        lo = np.searchsorted(self.thumbs_sorted, minimum, side='left')
+        return (len(self.thumbs_sorted) - lo, lambda: self.thumbs_order[lo:],
+                lambda rows: self.store.thumbs[rows] >= minimum)
+
+    def _version_condition(self, member):
+        if member is None:
+            return None
+        ranges = [(self.version_indptr[code], self.version_indptr[code + 1]) for code in np.flatnonzero(member)]
+        return (sum(hi - lo for lo, hi in ranges),
+                lambda: np.concatenate([self.version_rows[lo:hi] for lo, hi in ranges] or [self.version_rows[:0]]),
+                lambda rows: member[self.store.version_codes[rows]])
+
+    def _keyword_condition(self, keyword, index: InvertedIndex):
+        if not keyword:
+            return None
+        matching = index.lookup(keyword, self.store.content)
+        return (len(matching), lambda: matching,
+                lambda rows: np.isin(rows, matching, assume_unique=True))
+
+
+class FilteredView:
+    """The rows of a Dataset that match a filter
+
+    Has the attributes the tools read from a Dataset (store, aggregates,
+    sentiment, topics, version, versions); ``rows`` are the ids of the rows in the
+    full store. Aggregates and topics are computed on first use.
+    """
+
+    def __init__(self, dataset, filter: ReviewFilter, rows: np.ndarray):
+        self.filter = filter
+        self.rows = rows
+        self.version = dataset.version
+        self.versions = dataset.versions
+        self.store = dataset.store.take(rows)
+        self.sentiment = dataset.sentiment[rows]
+
+    @cached_property
+    def aggregates(self) -> Aggregates:
+        return Aggregates.build(self.store, tokens=False)
+
+    def prepare(self, topics: bool) -> None:
+        """Build the aggregates now; with ``topics`` the token counts come from the same build"""
+        if 'aggregates' in self.__dict__:
+            return
+        topics = topics and 'topics' not in self.__dict__
+        self.aggregates = Aggregates.build(self.store, tokens=topics)
+        if topics:
+            self.topics = TokenTable.from_counts(self.aggregates.tokens)
+
+    @cached_property
+    def topics(self) -> TokenTable:
+        counts = new_counts()
+        count_tokens(self.store.content, counts)
+        return TokenTable.from_counts(counts)
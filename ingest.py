@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental ingestion of new reviews.
+
+New rows are appended to the source CSV (which stays the source of truth) and
+to the binary snapshot in place, then the snapshot is memory-mapped again.
+Only the delta is parsed and written, so an hourly scrape costs time in
+proportion to its size rather than to the full review history.
+"""
+
+import csv
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from aggregates import Aggregates
+from dataset import Dataset
+from review_store import (COLUMNS, SNAPSHOT_META, ReviewStore, StringColumn, append_snapshot,
+                          snapshot_meta, source_fingerprint)
+from sentiment import store_flags
+from text_index import InvertedIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Category columns of the store: (codes attribute, names attribute)
+CATEGORIES = [
+    ('user_codes', 'user_names'),
+    ('created_codes', 'created_names'),
+    ('version_codes', 'version_names'),
+]
+
+
+def encode_delta(delta: ReviewStore, category_index: dict) -> dict:
+    """Columns of ``delta`` for append_snapshot, with category codes mapped into existing tables
+
+    ``category_index`` maps each names attribute of CATEGORIES to a
+    {name: code} dict; categories first seen in ``delta`` are added to it.
+    """
+    columns = {
+        'review_id': delta.review_id,
+        'content': delta.content,
+        'score': delta.score,
+        'thumbs': delta.thumbs,
+        'at': delta.at,
+        'content_len': delta.content_len,
+        'word_count': delta.word_count,
+        'present': delta.present,
+    }
+    for codes, names in CATEGORIES:
+        index = category_index[names]
+        mapping = np.empty(len(getattr(delta, names)), dtype=np.int32)
+        added = []
+        for local, name in enumerate(getattr(delta, names)):
+            code = index.get(name)
+            if code is None:
+                code = index[name] = len(index)
+                added.append(name)
+            mapping[local] = code
+        columns[codes] = mapping[getattr(delta, codes)]
+        columns[names] = StringColumn.from_strings(added)
+    return columns
+
+
+class ReviewIngestor:
+    """Appends unseen reviews to a dataset, its source CSV and its snapshot
+
+    The lookup tables needed to deduplicate reviewIds and extend the category
+    tables are built once from the first dataset seen and then kept up to date
+    with every batch. Callers must serialize ``ingest`` calls.
+    """
+
+    def __init__(self, data_file: Path, cache_dir: Path):
+        self.data_file = Path(data_file)
+        self.cache_dir = Path(cache_dir)
+        self._synced = None
+        self._seen_ids = set()
+        self._category_index = {}
+
+    def ingest(self, dataset: Dataset, path: Path) -> tuple[Dataset, int, int]:
+        """Append the reviews in ``path`` whose reviewId is not loaded yet
+
+        Returns the new dataset and the number of rows added and skipped.
+        """
+        import pandas as pd
+        raw = pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False, encoding='utf-8')
+        raw = raw.reindex(columns=COLUMNS, fill_value='')
+        self._sync(dataset)
+
+        ids = raw['reviewId'].tolist()
+        fresh = np.array([review_id not in self._seen_ids for review_id in ids], dtype=bool)
+        fresh &= ~raw['reviewId'].duplicated().to_numpy()
+        delta = raw[fresh]
+        skipped = len(raw) - len(delta)
+        if delta.empty:
+            return dataset, 0, skipped
+
+        csv_size = os.path.getsize(self.data_file)
+        try:
+            self._ensure_snapshot(dataset)
+            columns = encode_delta(ReviewStore.from_frame(delta), self._category_index)
+            self._append_csv(delta)
+            source = source_fingerprint(self.data_file)
+            append_snapshot(self.cache_dir, columns, source)
+        except Exception:
+            # Tables or snapshot may be half updated: force a full rebuild of both,
+            # and cut the CSV back so it still holds exactly ``dataset`` and a retry
+            # does not append the same rows twice
+            self._synced = None
+            (self.cache_dir / SNAPSHOT_META).unlink(missing_ok=True)
+            os.truncate(self.data_file, csv_size)
+            raise
+
+        self._seen_ids.update(delta['reviewId'])
+        store = ReviewStore.open(self.cache_dir, source)
+        # Only the appended rows are aggregated, indexed and classified
+        start = len(dataset.store)
+        appended = store.slice(start, len(store))
+        aggregates = dataset.aggregates.merged(Aggregates.build(appended))
+        appended_index = InvertedIndex.build(appended, start)
+        index = dataset.index.appended(appended_index)
+        sentiment = np.concatenate([dataset.sentiment, store_flags(appended, appended_index, start)])
+        new_dataset = Dataset(store, source, aggregates, index, sentiment)
+        self._synced = new_dataset
+        return new_dataset, len(delta), skipped
+
+    def _sync(self, dataset: Dataset) -> None:
+        """(Re)build the lookup tables if ``dataset`` is not the one they describe"""
+        if self._synced is dataset:
+            return
+        store = dataset.store
+        self._seen_ids = set(store.review_id)
+        self._category_index = {
+            names: {name: code for code, name in enumerate(getattr(store, names))}
+            for _, names in CATEGORIES
+        }
+        self._synced = dataset
+
+    def _ensure_snapshot(self, dataset: Dataset) -> None:
+        """Make sure the on-disk snapshot holds exactly ``dataset``"""
+        try:
+            meta = snapshot_meta(self.cache_dir)
+            if meta['rows'] == len(dataset.store) and meta['source'] == dataset.source:
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        dataset.store.save(self.cache_dir, dataset.source)
+
+    def _append_csv(self, delta: "pd.DataFrame") -> None:
+        """Append raw rows to the source CSV in its own column order and line endings"""
+        with open(self.data_file, 'rb') as f:
+            first_line = f.readline()
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size:
+                f.seek(-1, os.SEEK_END)
+            needs_newline = bool(size) and f.read(1) != b'\n'
+        header = next(csv.reader([first_line.decode('utf-8-sig')]))
+        terminator = '\r\n' if first_line.endswith(b'\r\n') else '\n'
+
+        with open(self.data_file, 'a', encoding='utf-8', newline='') as f:
+            if needs_newline:
+                f.write(terminator)
+            delta.reindex(columns=header, fill_value='').to_csv(f, header=False, index=False, lineterminator=terminator)
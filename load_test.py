@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Load test for the MCP server over streamable HTTP.
+
+Starts ``main.py http`` (unless --url points at a running server), then runs
+--clients concurrent clients, each with its own session, calling a mix of
+cheap and heavy tools for --seconds. Reports throughput and latency
+percentiles overall and per tool.
+
+    python load_test.py --clients 32 --seconds 20
+"""
+
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from fastmcp import Client
+
+import config
+
+# (tool, argument generator); varied arguments keep heavy calls from being served by the result cache
+WORKLOAD = [
+    ("review_score_distribution", lambda: {}),
+    ("sentiment_analysis", lambda: {}),
+    ("version_analysis", lambda: {}),
+    ("review_trends", lambda: {}),
+    ("top_reviewers", lambda: {"limit": random.randint(1, 200)}),
+    ("common_topics", lambda: {"limit": random.randint(1, 200), "min_length": random.randint(1, 8)}),
+    ("keyword_sentiment_analysis", lambda: {"keyword": random.choice("abcdefghijklmnopqrstuvwxyz") * random.randint(1, 2)}),
+]
+
+
+async def run_client(url: str, deadline: float, latencies: list) -> None:
+    async with Client(url, timeout=60) as client:
+        while time.perf_counter() < deadline:
+            tool, arguments = random.choice(WORKLOAD)
+            started = time.perf_counter()
+            await client.call_tool(tool, arguments())
+            latencies.append((tool, time.perf_counter() - started))
+
+
+async def wait_until_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with Client(url, timeout=5) as client:
+                await client.list_tools()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+def report(latencies: list, elapsed: float, clients: int) -> None:
+    def line(name, values):
+        values = np.array(values) * 1000
+        return (f"{name:<28} {len(values):>7,} {np.percentile(values, 50):>9.1f} "
+                f"{np.percentile(values, 99):>9.1f} {values.max():>9.1f}")
+
+    print(f"{clients} clients, {elapsed:.1f}s: {len(latencies):,} calls, {len(latencies) / elapsed:,.0f} calls/s")
+    print(f"{'tool':<28} {'calls':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for tool, _ in WORKLOAD:
+        print(line(tool, [latency for name, latency in latencies if name == tool]))
+    print(line("all", [latency for _, latency in latencies]))
+
+
+async def main(args) -> None:
+    latencies = []
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    await asyncio.gather(*[run_client(args.url, deadline, latencies) for _ in range(args.clients)])
+    report(latencies, time.perf_counter() - started, args.clients)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="URL of a running server (default: start main.py http)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        args.url = f"http://{config.MCP_HOST}:{config.MCP_PORT}/mcp"
+        server = subprocess.Popen([sys.executable, str(Path(__file__).with_name("main.py")), "http"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_until_ready(args.url, timeout=300))
+        asyncio.run(main(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -1,18 +1,36 @@
 # -*- coding: utf-8 -*-
+import time
+STARTED = time.perf_counter()  # Start of the server, for the startup timings below
+
 import json
-import csv
-import re
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
-from collections import Counter
-import statistics
-import pandas as pd
+from typing import Literal, Optional, Union
+import numpy as np
 import fastmcp
+from fastmcp.server.middleware import Middleware
+from fastmcp.tools import ToolResult
 from mcp.types import TextContent
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 import sys
 import io
 
+import config
+import sharding
+import streaming
+from aggregates import histogram_median
+from dataset import Dataset, DatasetManager
+from filters import FilteredView, ReviewFilter, date_bounds, describe, version_mask
+from ingest import ReviewIngestor
+from metrics import Metrics, peak_rss
+from result_cache import ResultCache
+from review_store import COLUMNS, ReviewStore, StaleSnapshotError, source_fingerprint
+from rollups import GRANULARITIES
+from sentiment import sentiment_counts
+
 # Enable UTF-8 output on Windows
 if sys.platform.startswith('win'):
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -23,37 +41,228 @@ server = fastmcp.FastMCP("Netflix Data Analyzer")
 
 # Configuration
 BASE_DIR = Path(__file__).parent
-DATA_FILE = BASE_DIR / "netflix_data.csv"
-CACHE_FILE = BASE_DIR / "netflix_cache.json"
+DATA_FILE = BASE_DIR / config.DATA_FILE
+CACHE_FILE = BASE_DIR / config.CACHE_FILE
+INGEST_DIR = BASE_DIR / config.INGEST_DIR
+
+# Latency, rows scanned and result size of every tool call and data load phase
+METRICS = Metrics(config.ENABLE_METRICS)
 
-def load_netflix_data() -> list[dict]:
-    """Load Netflix CSV data with caching"""
+@METRICS.instrument(name="analyze", rows=lambda dataset: len(dataset.store))
+def analyzed_dataset(store: ReviewStore, source: dict, shared: bool) -> Dataset:
+    """Dataset of ``store``; ``shared`` when CACHE_FILE holds it, so large stores can be analyzed in parallel"""
+    if shared and config.SHARD_WORKERS > 1 and len(store) >= config.SHARD_MIN_ROWS:
+        try:
+            return Dataset(store, source, *sharding.build_parallel(CACHE_FILE, source, len(store), config.SHARD_WORKERS))
+        except Exception as e:
+            sys.stderr.write(f"[SHARD] Parallel build failed, building serially: {e}\n")
+    return Dataset(store, source)
+
+@METRICS.instrument(rows=lambda dataset: len(dataset.store))
+def build_dataset() -> Dataset:
+    """Build a Dataset from DATA_FILE, reusing the binary snapshot when it is current
+    
+    The snapshot is reused only while DATA_FILE keeps the fingerprint it was
+    built from; a replaced CSV triggers a rebuild. Raises if the CSV cannot be read.
+    """
+    try:
+        source = source_fingerprint(DATA_FILE)
+    except OSError:
+        # No CSV to compare against: serve whatever snapshot exists
+        source = None
+    
     if CACHE_FILE.exists():
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        try:
+            # Memory-map the binary snapshot: no parse, pages load on demand
+            with METRICS.timer("snapshot_open"):
+                store = ReviewStore.open(CACHE_FILE, source)
+            return analyzed_dataset(store, source, shared=True)
+        except StaleSnapshotError as e:
+            sys.stderr.write(f"[CACHE] Rebuilding snapshot {CACHE_FILE}: {e}\n")
+        except (OSError, ValueError, KeyError) as e:
+            sys.stderr.write(f"[CACHE] Ignoring unreadable snapshot {CACHE_FILE}: {e}\n")
+    
+    if config.STREAMING:
+        # Out-of-core: the CSV is read in chunks straight into a new snapshot
+        with METRICS.timer("streaming_build"):
+            return parsed_dataset(streaming.build(DATA_FILE, CACHE_FILE, source, config.BATCH_SIZE))
+    
+    with METRICS.timer("csv_parse"):
+        data = ReviewStore.from_csv(DATA_FILE)
+    
+    # Cache the data
+    try:
+        with METRICS.timer("snapshot_save"):
+            data.save(CACHE_FILE, source)
+    except OSError as e:
+        sys.stderr.write(f"[CACHE] Could not write snapshot {CACHE_FILE}: {e}\n")
+        return parsed_dataset(analyzed_dataset(data, source, shared=False))
     
-    data = []
+    return parsed_dataset(analyzed_dataset(data, source, shared=True))
+
+def parsed_dataset(dataset: Dataset) -> Dataset:
+    """Report what parsing DATA_FILE could not read, then return ``dataset``"""
+    if dataset.aggregates.malformed_at:
+        sys.stderr.write(f"[PARSE] {dataset.aggregates.malformed_at:,} malformed 'at' timestamps in {DATA_FILE.name}, "
+                         f"stored as missing\n")
+    return dataset
+
+@METRICS.instrument(rows=lambda dataset: len(dataset.store))
+def load_netflix_data() -> Dataset:
+    """Load Netflix CSV data into the columnar review store with caching"""
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                data.append(row)
-        
-        # Cache the data
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
+        return build_dataset()
     except Exception as e:
-        print(f"Error loading data: {e}")
-        return []
+        sys.stderr.write(f"Error loading data: {e}\n")
+        return Dataset(ReviewStore.empty(), None)
+
+def startup_load() -> Dataset:
+    """Load the first dataset and report how long after start it was ready"""
+    dataset = load_netflix_data()
+    elapsed = time.perf_counter() - STARTED
+    METRICS.record("startup_dataset_ready", elapsed, len(dataset.store))
+    sys.stderr.write(f"[DATA] Loaded {len(dataset.store):,} reviews from Netflix dataset (version {dataset.version}) "
+                     f"{elapsed*1000:.0f} ms after start\n")
+    return dataset
+
+# Data loads in the background so the server answers the MCP handshake at once; tools wait for it.
+# Importing this module starts no thread: the load begins in __main__, or with the first tool call
+# when main is imported. The watcher swaps in new versions when DATA_FILE changes
+DATASET = DatasetManager(None, build_dataset, DATA_FILE, config.RELOAD_POLL_SECONDS, startup=startup_load)
+INGESTOR = ReviewIngestor(DATA_FILE, CACHE_FILE)
+
+# Tool results are reused until another dataset is swapped in or they expire
+RESULTS = ResultCache(config.RESULT_CACHE_MAX_ENTRIES, config.RESULT_CACHE_MAX_BYTES,
+                      config.CACHE_EXPIRY_HOURS * 3600, config.ENABLE_CACHE)
+
+def cached(func):
+    """Memoize a read-only tool on its arguments and the current dataset"""
+    return RESULTS.memoize(func, DATASET.identity)
+
+# Heavy tools run here, so a slow call never blocks the event loop serving other clients
+TOOL_POOL = ThreadPoolExecutor(max_workers=config.TOOL_WORKERS, thread_name_prefix="tool-worker")
+
+def instrumented(func):
+    """Record the calls of a tool in METRICS; goes below @offloaded so it runs in the worker thread"""
+    return METRICS.instrument(func)
+
+def tool_dataset(filter: Optional[ReviewFilter]) -> Dataset:
+    """The current dataset restricted to ``filter``; its rows are counted as scanned by the calling tool"""
+    dataset = DATASET.current().filtered(filter)
+    METRICS.scanned(len(dataset.store))
+    return dataset
+
+def version_totals(filter: Optional[ReviewFilter]) -> tuple:
+    """(dataset, reviews, rated, score_sum) per appVersion code for the version tools
+    
+    Filters on versions alone are answered from the aggregates of the whole
+    dataset with the other codes zeroed, without selecting rows.
+    """
+    current = DATASET.current()
+    if filter and set(filter) <= VERSION_FILTER_KEYS:
+        dataset = current
+        member = version_mask(current.versions, filter)
+    else:
+        dataset = tool_dataset(filter)
+        member = None
+    aggregates = dataset.aggregates
+    totals = [aggregates.version_reviews, aggregates.version_rated, aggregates.version_score_sum]
+    if member is not None:
+        totals = [np.where(member, values, 0) for values in totals]
+    return (dataset, *totals)
+
+def _filter_note(dataset: Dataset, filter: Optional[ReviewFilter], reviews: int) -> str:
+    """Filter line of a result answered from the whole dataset's aggregates (format_response adds it otherwise)"""
+    if not filter or isinstance(dataset, FilteredView):
+        return ""
+    return f"\n    Filter: {describe(filter)} ({reviews:,} reviews)"
+
+def offloaded(func):
+    """Turn a synchronous tool into a coroutine that runs it in TOOL_POOL"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(TOOL_POOL, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+# Filter conditions review_trends answers from the rollup cube of the whole dataset
+ROLLUP_FILTER_KEYS = {'start_date', 'end_date', 'version_prefix', 'version_since', 'version_until'}
+
+# Filter conditions that keep whole appVersion codes, answered from the per-version aggregates
+VERSION_FILTER_KEYS = {'version_prefix', 'version_since', 'version_until'}
+
+# Singular and plural names of the review_trends buckets
+TREND_UNITS = {'day': ('Day', 'Days'), 'week': ('Week', 'Weeks'), 'month': ('Month', 'Months')}
+
+def _top_indices(values: np.ndarray, limit: int) -> np.ndarray:
+    """Indices of the ``limit`` largest values, ties kept in first-seen order
     
-    return data
+    The cut-off value is found with a partial sort, so only the selected values are sorted.
+    """
+    limit = min(max(limit, 0), len(values))
+    if not limit:
+        return np.empty(0, dtype=np.intp)
+    if limit < len(values):
+        threshold = np.partition(values, len(values) - limit)[len(values) - limit]
+        above = np.flatnonzero(values > threshold)
+        candidates = np.concatenate([above, np.flatnonzero(values == threshold)[:limit - len(above)]])
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.lexsort((candidates, -values[candidates]))]
+
+def _result_limit(limit: int) -> int:
+    """``limit`` capped at MAX_RESULTS_PER_QUERY"""
+    return max(min(limit, config.MAX_RESULTS_PER_QUERY), 0)
+
+def _bucket_label(bucket: np.datetime64, granularity: str) -> str:
+    """Display name of a review_trends bucket"""
+    if granularity == 'month':
+        return str(bucket)[:7]
+    if granularity == 'week':
+        return f"Week of {bucket}"
+    return str(bucket)
+
+# Output of the analysis tools: decorated text, or compact JSON that is also the MCP structured content
+ResponseFormat = Literal["text", "json"]
 
-# Load data at startup
-NETFLIX_DATA = load_netflix_data()
+class FirstResponseTimer(Middleware):
+    """Reports how long after start the server answered its first MCP request"""
+
+    def __init__(self):
+        self.reported = False
+
+    async def on_request(self, context, call_next):
+        result = await call_next(context)
+        if not self.reported:
+            self.reported = True
+            elapsed = time.perf_counter() - STARTED
+            METRICS.record("startup_first_response", elapsed)
+            sys.stderr.write(f"[STARTUP] First response ({context.method}) {elapsed*1000:.0f} ms after start, "
+                             f"dataset {'ready' if DATASET.ready else 'still loading'}\n")
+        return result
+
+server.add_middleware(FirstResponseTimer())
 
 # ============= STYLING (DEFINE BEFORE TOOLS) =============
-def format_response(content: str) -> TextContent:
-    """Format MCP response with styling"""
+def structured_response(data: dict, dataset: Dataset) -> ToolResult:
+    """Return ``data`` as compact JSON and MCP structured content, with the dataset version (and filter)"""
+    data['dataset_version'] = dataset.version
+    if isinstance(dataset, FilteredView):
+        data['filter'] = dict(dataset.filter)
+        data['filtered_reviews'] = len(dataset.store)
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return ToolResult(content=[TextContent(type="text", text=text)], structured_content=data)
+
+def format_response(content: str, dataset: Dataset, format: ResponseFormat = "text") -> Union[TextContent, ToolResult]:
+    """Format MCP response with styling, noting the dataset version (and filter) it was computed on
+    
+    In json format only a message is expected; it becomes the ``message`` field.
+    """
+    if format == "json":
+        return structured_response({'message': content.strip()}, dataset)
+    if isinstance(dataset, FilteredView):
+        content += f"""
+    Filter: {describe(dataset.filter)} ({len(dataset.store):,} reviews)"""
     styled = f"""
     ╔════════════════════════════════════════════════════════════════╗
     ║           🎬 NETFLIX DATA ANALYZER - MCP SERVER 🎬             ║
@@ -64,6 +273,7 @@ def format_response(content: str) -> TextContent:
     ╔════════════════════════════════════════════════════════════════╗
     ║                    Analysis Complete ✓                         ║
     ╚════════════════════════════════════════════════════════════════╝
+    Dataset Version: {dataset.version}
     """
     return TextContent(type="text", text=styled)
 
@@ -71,14 +281,17 @@ def format_response(content: str) -> TextContent:
 @server.resource("netflix://data/overview")
 def get_data_overview() -> str:
     """Overview of Netflix dataset"""
-    if not NETFLIX_DATA:
+    dataset = DATASET.current()
+    store = dataset.store
+    if not store:
         return "No data available"
     
     return f"""
     🎬 Netflix App Reviews Dataset Overview
     =======================================
-    Total Reviews: {len(NETFLIX_DATA):,}
-    Data Load Time: {datetime.now().isoformat()}
+    Total Reviews: {len(store):,}
+    Data Load Time: {dataset.loaded_at.isoformat()}
+    Dataset Version: {dataset.version}
     Columns: reviewId, userName, content, score, thumbsUpCount, reviewCreatedVersion, at, appVersion
     Status: ✓ Ready for Analysis
     """
@@ -86,18 +299,18 @@ def get_data_overview() -> str:
 @server.resource("netflix://data/structure")
 def get_data_structure() -> str:
     """Data structure and schema"""
-    if not NETFLIX_DATA:
+    store = DATASET.current().store
+    if not store:
         return "No data available"
     
-    sample = NETFLIX_DATA[0] if NETFLIX_DATA else {}
-    schema_info = "\n".join([f"  - {key}: {type(sample.get(key, '')).__name__}" for key in sample.keys()])
+    schema_info = "\n".join([f"  - {key}: {dtype}" for key, dtype in store.schema().items()])
     return f"""
     📋 Netflix Data Schema
     ======================
     {schema_info}
     
     Sample Record:
-    {json.dumps(NETFLIX_DATA[0], ensure_ascii=False, indent=2)[:500]}...
+    {json.dumps(store.row(0), ensure_ascii=False, indent=2)[:500]}...
     """
 
 @server.resource("netflix://analysis/summary")
@@ -118,35 +331,94 @@ def get_analysis_summary() -> str:
     10. user_engagement_score - Calculate user engagement metrics
     11. review_completeness - Analyze data completeness
     12. keyword_sentiment_analysis - Analyze sentiment for specific keywords
+    13. ingest_reviews - Append new reviews from a CSV file
+    14. run_analyses - Run several of the analyses above in one call
     """
 
+@server.resource("netflix://cache/stats")
+def get_cache_stats() -> str:
+    """Hit/miss counters and usage of the tool result cache"""
+    stats = RESULTS.stats()
+    return f"""
+    🗄️ Tool Result Cache
+    ====================
+    Enabled: {stats['enabled']}
+    Hits: {stats['hits']:,}
+    Misses: {stats['misses']:,}
+    Hit Rate: {stats['hit_rate']*100:.1f}%
+    Entries: {stats['entries']:,} / {stats['max_entries']:,}
+    Size: {stats['bytes']:,} / {stats['max_bytes']:,} bytes
+    Evictions (LRU): {stats['evictions']:,}
+    Expirations (TTL): {stats['expirations']:,}
+    TTL: {stats['ttl_seconds']/3600:g} hours
+    """
+
+@server.resource("netflix://metrics")
+def get_metrics() -> str:
+    """Call counts, latency percentiles, rows scanned and result sizes per tool and load phase"""
+    if not METRICS.enabled:
+        return "Metrics are disabled (ENABLE_METRICS in config.py)"
+    metrics_info = "\n".join([
+        f"  {name}: {m['calls']:,} calls ({m['errors']:,} failed), "
+        f"p50 {m['p50_seconds']*1000:.1f} ms, p95 {m['p95_seconds']*1000:.1f} ms, p99 {m['p99_seconds']*1000:.1f} ms, "
+        f"max {m['max_seconds']*1000:.1f} ms, {m['rows_scanned']:,} rows, {m['result_bytes']:,} result bytes, "
+        f"peak RSS +{m['peak_rss_growth_bytes']/1024/1024:.1f} MB"
+        for name, m in METRICS.snapshot().items()
+    ]) or "  No calls recorded yet"
+    return f"""
+    ⏱️ Tool and Load Metrics
+    ========================
+    {metrics_info}
+    
+    Peak RSS: {(peak_rss() or 0)/1024/1024:.1f} MB
+    Prometheus text format: netflix://metrics/prometheus (and /metrics over HTTP)
+    """
+
+@server.resource("netflix://metrics/prometheus", mime_type="text/plain")
+def get_metrics_prometheus() -> str:
+    """The same metrics in the Prometheus text exposition format"""
+    return METRICS.prometheus()
+
+@server.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint of the HTTP transports"""
+    return PlainTextResponse(METRICS.prometheus(), media_type="text/plain; version=0.0.4")
+
 # ============= TOOLS =============
 
 @server.tool()
-def review_score_distribution() -> TextContent:
+@instrumented
+@cached
+def review_score_distribution(filter: Optional[ReviewFilter] = None,
+                              format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Analyze the distribution of review scores (ratings)"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
     
-    scores = []
-    for item in NETFLIX_DATA:
-        try:
-            score = int(item.get('score', 0))
-            scores.append(score)
-        except (ValueError, TypeError):
-            continue
+    score_counts = dataset.aggregates.score_counts
+    total_scores = int(score_counts.sum())
     
-    if not scores:
-        return format_response("No valid scores found")
+    if not total_scores:
+        return format_response("No valid scores found", dataset, format)
     
-    score_counts = Counter(scores)
+    scored = np.flatnonzero(score_counts)
     distribution = "\n".join([
-        f"  ⭐ {score} stars: {score_counts[score]:,} reviews ({score_counts[score]/len(scores)*100:.1f}%)"
-        for score in sorted(score_counts.keys())
+        f"  ⭐ {score} stars: {score_counts[score]:,} reviews ({score_counts[score]/total_scores*100:.1f}%)"
+        for score in scored
     ])
     
-    avg_score = statistics.mean(scores)
-    median_score = statistics.median(scores)
+    avg_score = (np.arange(len(score_counts)) * score_counts).sum() / total_scores
+    median_score = histogram_median(score_counts)
+    
+    if format == "json":
+        return structured_response({
+            'scores': [{'score': int(score), 'reviews': int(score_counts[score])} for score in scored],
+            'average_score': float(avg_score),
+            'median_score': median_score,
+            'total_reviews': total_scores,
+        }, dataset)
     
     result = f"""
     📊 Review Score Distribution
@@ -156,41 +428,30 @@ def review_score_distribution() -> TextContent:
     Statistics:
     - Average Score: {avg_score:.2f}
     - Median Score: {median_score}
-    - Total Reviews Analyzed: {len(scores):,}
-    - Score Range: {min(scores)} to {max(scores)}
+    - Total Reviews Analyzed: {total_scores:,}
+    - Score Range: {scored[0]} to {scored[-1]}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def sentiment_analysis() -> TextContent:
+@instrumented
+@cached
+def sentiment_analysis(filter: Optional[ReviewFilter] = None,
+                       format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Analyze sentiment from review content"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    positive_words = ['love', 'great', 'excellent', 'amazing', 'perfect', 'good', 'best', 'awesome', 'wonderful', 'fantastic']
-    negative_words = ['hate', 'bad', 'terrible', 'awful', 'worst', 'poor', 'horrible', 'useless', 'broken', 'garbage']
-    
-    positive_count = 0
-    negative_count = 0
-    neutral_count = 0
-    
-    for item in NETFLIX_DATA:
-        review_content = item.get('content', '').lower()
-        if not review_content:
-            neutral_count += 1
-            continue
-        
-        pos_found = any(word in review_content for word in positive_words)
-        neg_found = any(word in review_content for word in negative_words)
-        
-        if pos_found and not neg_found:
-            positive_count += 1
-        elif neg_found and not pos_found:
-            negative_count += 1
-        else:
-            neutral_count += 1
-    
-    total = len(NETFLIX_DATA)
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    # Lexicon hits are classified once per dataset
+    positive_count, negative_count, neutral_count = sentiment_counts(dataset.sentiment)
+    
+    total = len(store)
+    
+    if format == "json":
+        return structured_response({'positive': positive_count, 'negative': negative_count,
+                                    'neutral': neutral_count, 'total_reviews': total}, dataset)
     
     result = f"""
     💬 Sentiment Analysis
@@ -201,23 +462,32 @@ def sentiment_analysis() -> TextContent:
     
     Analysis based on keyword detection in review content.
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def top_reviewers(limit: int = 10) -> TextContent:
+@offloaded
+@instrumented
+@cached
+def top_reviewers(limit: int = config.TOP_K_RESULTS, filter: Optional[ReviewFilter] = None,
+                  format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Identify the most active reviewers"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    user_counts = Counter()
-    for item in NETFLIX_DATA:
-        username = item.get('userName', 'Unknown')
-        user_counts[username] += 1
-    
-    top_users = user_counts.most_common(limit)
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    user_counts = dataset.aggregates.user_reviews
+    
+    limit = _result_limit(limit)
+    top_users = _top_indices(user_counts, limit)
+    if format == "json":
+        return structured_response({
+            'reviewers': [{'user': store.user_names[code], 'reviews': int(user_counts[code])} for code in top_users],
+            'unique_reviewers': int(np.count_nonzero(user_counts)),
+        }, dataset)
     top_list = "\n".join([
-        f"  {i+1}. {user}: {count:,} reviews" 
-        for i, (user, count) in enumerate(top_users)
+        f"  {i+1}. {store.user_names[code]}: {user_counts[code]:,} reviews"
+        for i, code in enumerate(top_users)
     ])
     
     result = f"""
@@ -225,60 +495,95 @@ def top_reviewers(limit: int = 10) -> TextContent:
     ====================================
     {top_list}
     
-    Total Unique Reviewers: {len(user_counts):,}
+    Total Unique Reviewers: {np.count_nonzero(user_counts):,}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def version_analysis() -> TextContent:
-    """Analyze app version adoption and distribution"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    versions = Counter()
-    for item in NETFLIX_DATA:
-        version = item.get('appVersion', 'Unknown')
-        if version:
-            versions[version] += 1
-    
-    # Get top 10 versions
-    top_versions = versions.most_common(10)
+@instrumented
+@cached
+def version_analysis(level: str = "build", limit: int = config.TOP_K_RESULTS, filter: Optional[ReviewFilter] = None,
+                     format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Analyze app version adoption, with versions grouped by major, minor or build
+    
+    ``filter`` may select versions by prefix or by semantic range, e.g.
+    {"version_since": "8.100", "version_until": "8"} for every 8.x since 8.100.
+    """
+    dataset, reviews, rated, score_sum = version_totals(filter)
+    total = int(reviews.sum())
+    if not total:
+        return format_response("No data available", dataset, format)
+    
+    versions = dataset.versions
+    rollup = versions.rollup(level, reviews, rated, score_sum, config.RATING_PRIOR_WEIGHT)
+    counts = rollup['reviews']
+    labels = rollup['labels']
+    top_groups = [group for group in _top_indices(counts, _result_limit(limit)) if counts[group]]
+    used = np.flatnonzero(counts)
+    latest = labels[used[-1]] if len(used) else None
+    # Blank and unparseable appVersion values belong to no group
+    unversioned = int(reviews[~versions.parsed()].sum())
+    
+    if format == "json":
+        data = {
+            'level': level,
+            'versions': [{'version': labels[group], 'reviews': int(counts[group])} for group in top_groups],
+            'latest_version': latest,
+            'unique_versions': len(used),
+            'unversioned_reviews': unversioned,
+            'total_reviews': total,
+        }
+        if not isinstance(dataset, FilteredView) and filter:
+            data.update(filter=dict(filter), filtered_reviews=total)
+        return structured_response(data, dataset)
     version_list = "\n".join([
-        f"  📱 v{version}: {count:,} reviews ({count/len(NETFLIX_DATA)*100:.1f}%)"
-        for version, count in top_versions
+        f"  📱 v{labels[group]}: {counts[group]:,} reviews ({counts[group]/total*100:.1f}%)"
+        for group in top_groups
     ])
+    most_common = f"{labels[top_groups[0]]} ({counts[top_groups[0]]:,} reviews)" if top_groups else "N/A"
     
     result = f"""
-    📱 App Version Distribution
+    📱 App Version Distribution ({level})
     ============================
     {version_list}
     
-    Total Unique Versions: {len(versions)}
-    Most Common: {top_versions[0][0] if top_versions else 'N/A'} ({top_versions[0][1]:,} reviews)
+    Total Unique Versions: {len(used)}
+    Most Common: {most_common}
+    Latest: {latest or 'N/A'}
+    Reviews Without a Version: {unversioned:,}
     """
-    return format_response(result)
+    result += _filter_note(dataset, filter, total)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def thumbs_up_analysis() -> TextContent:
+@instrumented
+@cached
+def thumbs_up_analysis(filter: Optional[ReviewFilter] = None,
+                       format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Analyze engagement through thumbs up counts"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    thumbs_up_counts = []
-    for item in NETFLIX_DATA:
-        try:
-            count = int(item.get('thumbsUpCount', 0))
-            thumbs_up_counts.append(count)
-        except (ValueError, TypeError):
-            continue
-    
-    if not thumbs_up_counts:
-        return format_response("No thumbs up data available")
-    
-    total_thumbs = sum(thumbs_up_counts)
-    avg_thumbs = statistics.mean(thumbs_up_counts)
-    max_thumbs = max(thumbs_up_counts)
-    reviews_with_thumbs = sum(1 for c in thumbs_up_counts if c > 0)
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    aggregates = dataset.aggregates
+    
+    if not aggregates.thumbs_count:
+        return format_response("No thumbs up data available", dataset, format)
+    
+    total_thumbs = aggregates.thumbs_sum
+    avg_thumbs = total_thumbs / aggregates.thumbs_count
+    max_thumbs = aggregates.thumbs_max
+    reviews_with_thumbs = aggregates.thumbs_nonzero
+    
+    if format == "json":
+        return structured_response({
+            'total_thumbs_up': int(total_thumbs),
+            'average_per_review': float(avg_thumbs),
+            'max_thumbs_up': int(max_thumbs),
+            'reviews_with_thumbs_up': int(reviews_with_thumbs),
+            'reviews_analyzed': int(aggregates.thumbs_count),
+        }, dataset)
     
     result = f"""
     👍 Engagement Analysis (Thumbs Up)
@@ -286,36 +591,45 @@ def thumbs_up_analysis() -> TextContent:
     Total Thumbs Up: {total_thumbs:,}
     Average per Review: {avg_thumbs:.2f}
     Maximum Thumbs Up: {max_thumbs}
-    Reviews with Thumbs Up: {reviews_with_thumbs:,} ({reviews_with_thumbs/len(thumbs_up_counts)*100:.1f}%)
+    Reviews with Thumbs Up: {reviews_with_thumbs:,} ({reviews_with_thumbs/aggregates.thumbs_count*100:.1f}%)
     
-    Total Reviews Analyzed: {len(thumbs_up_counts):,}
+    Total Reviews Analyzed: {aggregates.thumbs_count:,}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def content_length_analysis() -> TextContent:
+@instrumented
+@cached
+def content_length_analysis(filter: Optional[ReviewFilter] = None,
+                            format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Analyze review content length patterns"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    lengths = []
-    word_counts = []
-    empty_reviews = 0
-    
-    for item in NETFLIX_DATA:
-        review_content = item.get('content', '')
-        if not review_content:
-            empty_reviews += 1
-            continue
-        lengths.append(len(review_content))
-        word_counts.append(len(review_content.split()))
-    
-    if not lengths:
-        return format_response(f"All {empty_reviews:,} reviews are empty")
-    
-    avg_length = statistics.mean(lengths)
-    median_length = statistics.median(lengths)
-    avg_words = statistics.mean(word_counts)
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    length_counts = dataset.aggregates.length_counts
+    analyzed = int(length_counts.sum())
+    empty_reviews = len(store) - analyzed
+    
+    if not analyzed:
+        return format_response(f"All {empty_reviews:,} reviews are empty", dataset, format)
+    
+    lengths = np.flatnonzero(length_counts)
+    avg_length = (lengths * length_counts[lengths]).sum() / analyzed
+    median_length = histogram_median(length_counts)
+    avg_words = dataset.aggregates.word_sum / analyzed
+    
+    if format == "json":
+        return structured_response({
+            'average_length': float(avg_length),
+            'median_length': median_length,
+            'average_words': float(avg_words),
+            'longest': int(lengths[-1]),
+            'shortest': int(lengths[0]),
+            'empty_reviews': empty_reviews,
+            'reviews_analyzed': analyzed,
+        }, dataset)
     
     result = f"""
     📝 Review Content Analysis
@@ -323,201 +637,257 @@ def content_length_analysis() -> TextContent:
     Average Content Length: {avg_length:.0f} characters
     Median Content Length: {median_length} characters
     Average Word Count: {avg_words:.0f} words
-    Longest Review: {max(lengths)} characters
-    Shortest Review: {min(lengths)} characters
+    Longest Review: {lengths[-1]} characters
+    Shortest Review: {lengths[0]} characters
     
     Empty Reviews: {empty_reviews:,}
-    Total Analyzed: {len(lengths):,}
+    Total Analyzed: {analyzed:,}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def common_topics() -> TextContent:
-    """Extract common topics and keywords from reviews"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    # Common words to exclude
-    stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'is', 'it', 'to', 'of', 'in', 'for', 'on', 'with', 'i', 'you', 'he', 'she', 'this', 'that', 'be', 'have', 'has', 'are', 'was', 'were', 'very', 'so', 'as', 'from', 'by', 'at', 'my', 'me', 'if', 'can', 'get', 'got', 'really', 'just', 'more', 'one', 'two', 'like', 'love', 'good', 'bad'}
-    
-    all_words = Counter()
-    
-    for item in NETFLIX_DATA:
-        review_content = item.get('content', '').lower()
-        if review_content:
-            # Extract words
-            words = re.findall(r'\b[a-z]+\b', review_content)
-            for word in words:
-                if word not in stopwords and len(word) > 3:
-                    all_words[word] += 1
-    
-    top_keywords = all_words.most_common(15)
+@offloaded
+@instrumented
+@cached
+def common_topics(limit: int = 15, min_length: int = 4, filter: Optional[ReviewFilter] = None,
+                  format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Extract common topics and keywords from reviews (stopwords excluded)"""
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    # Token counts are sorted once per dataset; stopwords are never counted
+    topics = dataset.topics
+    top_keywords = topics.top(limit, min_length)
+    if format == "json":
+        return structured_response({
+            'keywords': [{'keyword': keyword, 'count': int(count)} for keyword, count in top_keywords],
+            'unique_keywords': int(topics.unique(min_length)),
+            'approximate': topics.approximate,
+        }, dataset)
     keywords_list = "\n".join([
         f"  {i+1}. '{keyword}': {count:,} occurrences"
         for i, (keyword, count) in enumerate(top_keywords)
     ])
     
+    if topics.approximate:
+        unique_line = f"Tracked Keywords: {topics.unique(min_length):,} (approximate counts)"
+    else:
+        unique_line = f"Unique Keywords: {topics.unique(min_length):,}"
+    
     result = f"""
     🔑 Common Topics & Keywords
     =============================
     {keywords_list}
     
-    Unique Keywords: {len(all_words):,}
+    {unique_line}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def rating_by_version() -> TextContent:
-    """Compare average ratings across different app versions"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    version_ratings = {}
-    
-    for item in NETFLIX_DATA:
-        version = item.get('appVersion', 'Unknown')
-        try:
-            score = int(item.get('score', 0))
-            if version not in version_ratings:
-                version_ratings[version] = []
-            version_ratings[version].append(score)
-        except (ValueError, TypeError):
-            continue
-    
-    # Calculate averages for top versions
-    version_avg = {}
-    for version, ratings in version_ratings.items():
-        if ratings:
-            version_avg[version] = statistics.mean(ratings)
-    
-    # Sort by average rating
-    sorted_versions = sorted(version_avg.items(), key=lambda x: x[1], reverse=True)[:10]
+@instrumented
+@cached
+def rating_by_version(level: str = "build", order: Literal["rating", "version"] = "rating",
+                      limit: int = config.TOP_K_RESULTS, filter: Optional[ReviewFilter] = None,
+                      format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Compare ratings across app versions grouped by major, minor or build
+    
+    Versions are ranked by a Bayesian average that counts the overall average
+    as RATING_PRIOR_WEIGHT extra ratings, so a version with a handful of
+    ratings does not outrank one with thousands; ``order="version"`` lists
+    the newest versions first instead. ``filter`` takes version ranges as in
+    version_analysis.
+    """
+    dataset, reviews, rated, score_sum = version_totals(filter)
+    total = int(reviews.sum())
+    if not total:
+        return format_response("No data available", dataset, format)
+    
+    rollup = dataset.versions.rollup(level, reviews, rated, score_sum, config.RATING_PRIOR_WEIGHT)
+    labels = rollup['labels']
+    counts = rollup['rated']
+    weighted = rollup['weighted']
+    average = rollup['average']
+    groups = np.flatnonzero(counts)
+    limit = _result_limit(limit)
+    if order == "rating":
+        shown = groups[_top_indices(weighted[groups], limit)]
+    else:
+        shown = groups[::-1][:limit]
+    
+    if format == "json":
+        data = {
+            'level': level,
+            'order': order,
+            'versions': [
+                {'version': labels[group], 'weighted_rating': float(weighted[group]),
+                 'average_rating': float(average[group]), 'ratings': int(counts[group])}
+                for group in shown
+            ],
+            'prior_rating': rollup['prior'],
+            'prior_weight': config.RATING_PRIOR_WEIGHT,
+            'total_versions': len(groups),
+        }
+        if not isinstance(dataset, FilteredView) and filter:
+            data.update(filter=dict(filter), filtered_reviews=total)
+        return structured_response(data, dataset)
     version_list = "\n".join([
-        f"  📱 v{version}: ⭐ {avg:.2f} avg ({len(version_ratings[version]):,} reviews)"
-        for version, avg in sorted_versions
+        f"  📱 v{labels[group]}: ⭐ {weighted[group]:.2f} weighted ({average[group]:.2f} avg, {counts[group]:,} ratings)"
+        for group in shown
     ])
     
     result = f"""
-    ⭐ Rating Analysis by App Version
+    ⭐ Rating Analysis by App Version ({level})
     ==================================
     {version_list}
     
-    Total Versions: {len(version_ratings)}
+    Total Versions: {len(groups)}
+    Weighted toward the overall ⭐ {rollup['prior']:.2f} avg as {config.RATING_PRIOR_WEIGHT:g} extra ratings
     """
-    return format_response(result)
+    result += _filter_note(dataset, filter, total)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def review_trends() -> TextContent:
-    """Analyze review trends over time"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    date_reviews = Counter()
-    dates = []
-    
-    for item in NETFLIX_DATA:
-        date_str = item.get('at', '')
-        if date_str:
-            try:
-                # Extract just the date part (YYYY-MM-DD)
-                date_only = date_str.split()[0]
-                date_reviews[date_only] += 1
-                dates.append(date_only)
-            except:
-                continue
-    
-    if not date_reviews:
-        return format_response("No date information available")
-    
-    # Get recent dates
-    recent_dates = sorted(date_reviews.items())[-10:]
-    trends_list = "\n".join([
-        f"  {date}: {count:,} reviews"
-        for date, count in recent_dates
-    ])
-    
-    avg_per_day = statistics.mean(date_reviews.values())
+@instrumented
+@cached
+def review_trends(granularity: str = "day", periods: int = 10, filter: Optional[ReviewFilter] = None,
+                  format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Analyze review volume, ratings and thumbs up over time by day, week or month"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    current = DATASET.current()
+    start, stop = date_bounds(filter)
+    days = [bound if bound is None else bound.astype('datetime64[D]') for bound in (start, stop)]
+    
+    if set(filter or {}) <= ROLLUP_FILTER_KEYS and all(day is None or day == bound for day, bound in zip(days, (start, stop))):
+        # Whole-day windows and version prefixes are answered from the rollup cube, not the rows
+        dataset = current
+        trend = current.aggregates.rollup.series(granularity, *days, version_mask(current.versions, filter))
+    else:
+        dataset = current.filtered(filter)
+        trend = dataset.aggregates.rollup.series(granularity)
+    
+    if not dataset.store:
+        return format_response("No data available", dataset, format)
+    
+    buckets = trend['buckets']
+    counts = trend['count']
+    if not len(buckets):
+        return format_response("No date information available", dataset, format)
+    
+    rated = trend['score_hist'].sum(axis=1)
+    unit, units = TREND_UNITS[granularity]
+    
+    if format == "json":
+        recent = slice(max(len(buckets) - periods, 0), len(buckets))
+        data = {
+            'granularity': granularity,
+            'buckets': [
+                {'start': str(bucket), 'reviews': int(count),
+                 'average_rating': float(score_sum / rated_count) if rated_count else None, 'thumbs_up': int(thumbs)}
+                for bucket, count, score_sum, rated_count, thumbs in zip(
+                    buckets[recent], counts[recent], trend['score_sum'][recent], rated[recent], trend['thumbs_sum'][recent])
+            ],
+            'average_reviews': float(counts.mean()),
+            'buckets_with_reviews': len(buckets),
+        }
+        if dataset is current and filter:
+            data.update(filter=dict(filter), filtered_reviews=int(counts.sum()))
+        return structured_response(data, dataset)
+    
+    # Get recent buckets
+    trend_lines = []
+    for i in range(max(len(buckets) - periods, 0), len(buckets)):
+        rating = f"⭐ {trend['score_sum'][i] / rated[i]:.2f} avg" if rated[i] else "no ratings"
+        trend_lines.append(f"  {_bucket_label(buckets[i], granularity)}: {counts[i]:,} reviews "
+                           f"({rating}, {trend['thumbs_sum'][i]:,} thumbs up)")
+    trends_list = "\n".join(trend_lines)
     
     result = f"""
     📅 Review Trends Over Time
     ============================
-    Last 10 Days:
+    Last {periods} {units}:
     {trends_list}
     
-    Average Reviews per Day: {avg_per_day:.0f}
-    Total Days with Reviews: {len(date_reviews)}
+    Average Reviews per {unit}: {counts.mean():.0f}
+    Total {units} with Reviews: {len(buckets)}
     """
-    return format_response(result)
+    if dataset is current and filter:
+        result += f"\n    Filter: {describe(filter)} ({counts.sum():,} reviews)"
+    return format_response(result, dataset, format)
 
 @server.tool()
-def user_engagement_score() -> TextContent:
+@offloaded
+@instrumented
+@cached
+def user_engagement_score(limit: int = config.TOP_K_RESULTS, filter: Optional[ReviewFilter] = None,
+                          format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Calculate comprehensive user engagement metrics"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    engagement_data = {}
-    
-    for item in NETFLIX_DATA:
-        user = item.get('userName', 'Unknown')
-        if user not in engagement_data:
-            engagement_data[user] = {
-                'review_count': 0,
-                'total_thumbs': 0,
-                'avg_rating': []
-            }
-        
-        engagement_data[user]['review_count'] += 1
-        try:
-            engagement_data[user]['total_thumbs'] += int(item.get('thumbsUpCount', 0))
-            engagement_data[user]['avg_rating'].append(int(item.get('score', 0)))
-        except:
-            pass
-    
-    # Calculate engagement scores
-    engagement_scores = []
-    for user, data in engagement_data.items():
-        reviews = data['review_count']
-        thumbs = data['total_thumbs']
-        avg_rating = statistics.mean(data['avg_rating']) if data['avg_rating'] else 0
-        engagement_score = (reviews * 0.4) + (thumbs * 0.3) + (avg_rating * 0.3)
-        engagement_scores.append((user, engagement_score, reviews, thumbs))
-    
-    # Sort by engagement score
-    top_engaged = sorted(engagement_scores, key=lambda x: x[1], reverse=True)[:10]
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
+    
+    aggregates = dataset.aggregates
+    review_counts = aggregates.user_reviews
+    total_thumbs = aggregates.user_thumbs
+    rating_counts = aggregates.user_rated
+    avg_rating = np.divide(aggregates.user_score_sum, rating_counts,
+                           out=np.zeros(len(rating_counts)), where=rating_counts > 0)
+    
+    # Calculate engagement scores, in place to hold one float array per user
+    engagement_scores = review_counts * 0.4
+    engagement_scores += total_thumbs * 0.3
+    engagement_scores += avg_rating * 0.3
+    
+    # Select the highest engagement scores
+    limit = _result_limit(limit)
+    top_engaged = _top_indices(engagement_scores, limit)
+    if format == "json":
+        return structured_response({
+            'users': [
+                {'user': store.user_names[code], 'score': float(engagement_scores[code]), 'reviews': int(review_counts[code]),
+                 'thumbs_up': int(total_thumbs[code]), 'average_rating': float(avg_rating[code])}
+                for code in top_engaged
+            ],
+            'active_users': int(np.count_nonzero(review_counts)),
+        }, dataset)
     engaged_list = "\n".join([
-        f"  {i+1}. {user}: Score {score:.2f} ({reviews} reviews, {thumbs} thumbs up)"
-        for i, (user, score, reviews, thumbs) in enumerate(top_engaged)
+        f"  {i+1}. {store.user_names[code]}: Score {engagement_scores[code]:.2f} ({review_counts[code]} reviews, {total_thumbs[code]:.0f} thumbs up)"
+        for i, code in enumerate(top_engaged)
     ])
     
     result = f"""
     🎯 User Engagement Score
     ==========================
-    Top 10 Engaged Users:
+    Top {limit} Engaged Users:
     {engaged_list}
     
-    Total Active Users: {len(engagement_data):,}
+    Total Active Users: {np.count_nonzero(review_counts):,}
     Engagement Score = (Reviews × 0.4) + (Thumbs Up × 0.3) + (Avg Rating × 0.3)
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def review_completeness() -> TextContent:
+@instrumented
+@cached
+def review_completeness(filter: Optional[ReviewFilter] = None,
+                        format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
     """Analyze data completeness and missing values"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
+    dataset = tool_dataset(filter)
+    store = dataset.store
+    if not store:
+        return format_response("No data available", dataset, format)
     
-    columns = ['reviewId', 'userName', 'content', 'score', 'thumbsUpCount', 'reviewCreatedVersion', 'at', 'appVersion']
-    completeness = {col: 0 for col in columns}
+    completeness = dict(zip(COLUMNS, dataset.aggregates.completeness.tolist()))
     
-    for item in NETFLIX_DATA:
-        for col in columns:
-            if item.get(col) and str(item.get(col)).strip():
-                completeness[col] += 1
-    
-    total = len(NETFLIX_DATA)
+    total = len(store)
+    if format == "json":
+        return structured_response({'present': completeness, 'malformed_at': int(dataset.aggregates.malformed_at), 'total_records': total}, dataset)
     completeness_list = "\n".join([
         f"  {col}: {completeness[col]:,}/{total:,} ({completeness[col]/total*100:.1f}%)"
-        for col in columns
+        for col in COLUMNS
     ])
     
     result = f"""
@@ -525,49 +895,52 @@ def review_completeness() -> TextContent:
     =============================
     {completeness_list}
     
+    Malformed Timestamps (at): {dataset.aggregates.malformed_at:,}
     Total Records: {total:,}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
 
 @server.tool()
-def keyword_sentiment_analysis(keyword: str) -> TextContent:
-    """Analyze sentiment for specific keywords"""
-    if not NETFLIX_DATA:
-        return format_response("No data available")
-    
-    keyword_lower = keyword.lower()
-    positive_words = ['love', 'great', 'excellent', 'amazing', 'perfect', 'good', 'best', 'awesome', 'wonderful', 'fantastic']
-    negative_words = ['hate', 'bad', 'terrible', 'awful', 'worst', 'poor', 'horrible', 'useless', 'broken', 'garbage']
-    
-    matching_reviews = []
-    positive = 0
-    negative = 0
-    neutral = 0
-    
-    for item in NETFLIX_DATA:
-        review_content = item.get('content', '').lower()
-        if keyword_lower in review_content:
-            matching_reviews.append(item)
-            
-            pos_found = any(word in review_content for word in positive_words)
-            neg_found = any(word in review_content for word in negative_words)
-            
-            if pos_found and not neg_found:
-                positive += 1
-            elif neg_found and not pos_found:
-                negative += 1
-            else:
-                neutral += 1
-    
-    if not matching_reviews:
-        return format_response(f"No reviews found containing keyword: '{keyword}'")
+@offloaded
+@instrumented
+@cached
+def keyword_sentiment_analysis(keyword: str, whole_word: bool = False, filter: Optional[ReviewFilter] = None,
+                               format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Analyze sentiment for specific keywords (substring match unless whole_word is set)"""
+    current = DATASET.current()
+    dataset = current.filtered(filter)
+    METRICS.scanned(len(dataset.store))
+    store = current.store
+    if not dataset.store:
+        return format_response("No data available", dataset, format)
+    
+    # Posting-list lookup; positive/negative lexicon hits are precomputed per review
+    matching_reviews = current.index.lookup(keyword, store.content, whole_word)
+    if dataset is not current:
+        matching_reviews = matching_reviews[np.isin(matching_reviews, dataset.rows, assume_unique=True)]
+    positive, negative, neutral = sentiment_counts(current.sentiment[matching_reviews])
+    
+    if not len(matching_reviews):
+        return format_response(f"No reviews found containing keyword: '{keyword}'", dataset, format)
     
     total_matching = len(matching_reviews)
     
-    sample_reviews = json.dumps([
-        {"userName": r.get("userName"), "content": r.get("content", "")[:100]} 
-        for r in matching_reviews[:3]
-    ], ensure_ascii=False, indent=2)
+    samples = [
+        {"userName": store.user_names[store.user_codes[i]], "content": store.content[i][:100]}
+        for i in matching_reviews[:3]
+    ]
+    if format == "json":
+        return structured_response({
+            'keyword': keyword,
+            'whole_word': whole_word,
+            'mentions': total_matching,
+            'positive': positive,
+            'negative': negative,
+            'neutral': neutral,
+            'samples': samples,
+        }, dataset)
+    
+    sample_reviews = json.dumps(samples, ensure_ascii=False, indent=2)
     
     result = f"""
     🔍 Sentiment Analysis for Keyword: '{keyword}'
@@ -582,14 +955,105 @@ def keyword_sentiment_analysis(keyword: str) -> TextContent:
     Sample Reviews with '{keyword}':
     {sample_reviews}
     """
-    return format_response(result)
+    return format_response(result, dataset, format)
+
+# Tools run_analyses can batch
+ANALYSES = {
+    tool.__name__: tool
+    for tool in (review_score_distribution, sentiment_analysis, top_reviewers, version_analysis,
+                 thumbs_up_analysis, content_length_analysis, common_topics, rating_by_version,
+                 review_trends, user_engagement_score, review_completeness, keyword_sentiment_analysis)
+}
+
+@server.tool()
+@offloaded
+@instrumented
+def run_analyses(names: list[str], filter: Optional[ReviewFilter] = None,
+                 arguments: Optional[dict[str, dict]] = None,
+                 format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[list[TextContent], ToolResult]:
+    """Run several analyses on the same filtered reviews in one call
+    
+    ``names`` are analysis tool names; ``arguments`` maps a name to its other
+    arguments, e.g. {"keyword_sentiment_analysis": {"keyword": "crash"}}.
+    The filter is applied and its rows aggregated once for all of them.
+    """
+    unknown = [name for name in names if name not in ANALYSES]
+    if unknown:
+        raise ValueError(f"Unknown analyses: {', '.join(unknown)}; choose from {', '.join(ANALYSES)}")
+    arguments = arguments or {}
+    
+    # One selection and one aggregation pass (token counts included when topics are asked for);
+    # each analysis then finds the view in the dataset's view cache
+    dataset = DATASET.current().filtered(filter)
+    if isinstance(dataset, FilteredView):
+        dataset.prepare(topics='common_topics' in names)
+    
+    results = {}
+    for name in dict.fromkeys(names):
+        tool = ANALYSES[name]
+        # Offloaded tools run their synchronous function here, in this worker thread
+        run = tool.__wrapped__ if asyncio.iscoroutinefunction(tool) else tool
+        try:
+            results[name] = run(**arguments.get(name, {}), filter=filter, format=format)
+        except Exception as e:
+            results[name] = format_response(f"{name} failed: {e}", dataset, format)
+    
+    if format == "json":
+        return structured_response({'analyses': {name: result.structured_content for name, result in results.items()}},
+                                   dataset)
+    return list(results.values())
+
+@server.tool()
+@offloaded
+@instrumented
+def ingest_reviews(csv_path: str, format: ResponseFormat = config.RESPONSE_FORMAT) -> Union[TextContent, ToolResult]:
+    """Append new reviews from a CSV file in the ingest directory, skipping reviewIds that are already loaded"""
+    root = INGEST_DIR.resolve()
+    path = (root / csv_path).resolve()
+    if not path.is_relative_to(root):
+        return format_response(f"Error ingesting {csv_path}: only files inside {root} can be ingested",
+                               DATASET.current(), format)
+    try:
+        with DATASET.lock:
+            previous = DATASET.current()
+            dataset, added, skipped = INGESTOR.ingest(previous, path)
+            DATASET.swap(dataset)
+    except Exception as e:
+        return format_response(f"Error ingesting {csv_path}: {e}", DATASET.current(), format)
+    
+    if format == "json":
+        return structured_response({
+            'added': added,
+            'skipped': skipped,
+            'malformed_at': int(dataset.aggregates.malformed_at - previous.aggregates.malformed_at),
+            'total_reviews': len(dataset.store),
+        }, dataset)
+    
+    result = f"""
+    📥 Review Ingestion
+    ====================
+    New Reviews Added: {added:,}
+    Already Loaded (skipped): {skipped:,}
+    Malformed Timestamps: {dataset.aggregates.malformed_at - previous.aggregates.malformed_at:,}
+    Total Reviews: {len(dataset.store):,}
+    """
+    return format_response(result, dataset, format)
 
 if __name__ == "__main__":
     # Only log to stderr to avoid interfering with MCP JSON-RPC protocol on stdout
     sys.stderr.write("[SERVER] Starting Netflix Data Analyzer MCP Server...\n")
-    sys.stderr.write(f"[DATA] Loaded {len(NETFLIX_DATA):,} reviews from Netflix dataset\n")
-    sys.stderr.write("[OK] Server ready. Use MCP client to connect.\n")
-    sys.stderr.flush()
-    
-    # Run the server
-    asyncio.run(server.run())
+    DATASET.load_in_background()
+    sys.stderr.write(f"[STARTUP] Imports done {(time.perf_counter() - STARTED)*1000:.0f} ms after start, "
+                     f"dataset {'ready' if DATASET.ready else 'loading in the background'}\n")
+    DATASET.start_watcher()
+    
+    # Transport: "stdio" (default), "http" (streamable HTTP) or "sse"; overridable as the first argument
+    transport = sys.argv[1] if len(sys.argv) > 1 else config.MCP_TRANSPORT
+    if transport == "stdio":
+        sys.stderr.write("[OK] Server ready. Use MCP client to connect.\n")
+        sys.stderr.flush()
+        server.run()
+    else:
+        sys.stderr.write(f"[OK] Serving {transport} on {config.MCP_HOST}:{config.MCP_PORT}\n")
+        sys.stderr.flush()
+        server.run(transport=transport, host=config.MCP_HOST, port=config.MCP_PORT)
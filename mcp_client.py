@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent MCP client for the Streamlit app.
+
+One client session to the main.py server is opened per process and shared by
+every Streamlit session: the session lives on a background event loop and
+requests from different threads are multiplexed over it. The target is
+either "stdio" (main.py is started as a subprocess) or the URL of a server
+running the streamable HTTP transport. Connections are kept in a registry
+keyed on the target, which closes every connection it replaces or drops;
+being a module, it outlives the Streamlit script reruns.
+"""
+
+import asyncio
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+
+SERVER_SCRIPT = Path(__file__).with_name("main.py")
+
+# Path of the streamable HTTP endpoint when the URL does not name one
+DEFAULT_HTTP_PATH = "/mcp"
+
+# Targets with an open connection; the least recently opened is closed beyond this
+MAX_CONNECTIONS = 4
+
+
+class MCPConnection:
+    """A lazily opened, shared MCP client session that reconnects after a failure"""
+
+    def __init__(self, target: str, timeout: float = 30):
+        self.target = target
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-client", daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._client = None
+
+    def _transport(self):
+        if self.target == "stdio":
+            return SERVER_SCRIPT
+        url = urlparse(self.target)
+        if url.path in ("", "/"):
+            url = url._replace(path=DEFAULT_HTTP_PATH)
+        return url.geturl()
+
+    def _run(self, coro):
+        """Run ``coro`` on the session's loop and wait for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(self.timeout)
+
+    def _connected(self) -> Client:
+        with self._lock:
+            if self._client is None or not self._client.is_connected():
+                client = Client(self._transport(), timeout=self.timeout)
+                self._run(client.__aenter__())
+                self._client = client
+            return self._client
+
+    def _drop(self, client: Client) -> None:
+        """Forget a failed session so the next call opens a new one"""
+        with self._lock:
+            if self._client is client:
+                self._client = None
+        try:
+            self._run(client.__aexit__(None, None, None))
+        except Exception:
+            pass
+
+    def call_tool(self, name: str, arguments: dict = None) -> str:
+        """Text of a tool call's result; raises if the server cannot be reached or the tool fails"""
+        client = self._connected()
+        try:
+            result = self._run(client.call_tool(name, arguments or {}))
+        except ToolError:
+            # The tool failed; the session is fine
+            raise
+        except Exception:
+            self._drop(client)
+            raise
+        return "\n".join(block.text for block in result.content if hasattr(block, "text"))
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            try:
+                self._run(client.__aexit__(None, None, None))
+            except Exception:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# target -> MCPConnection, least recently opened first
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(target: str, timeout: float = 30) -> MCPConnection:
+    """The shared connection to ``target``, replacing one opened with another timeout"""
+    with _connections_lock:
+        connection = _connections.get(target)
+        if connection is not None and connection.timeout == timeout:
+            return connection
+        closed = [_connections.pop(target)] if connection is not None else []
+        connection = _connections[target] = MCPConnection(target, timeout)
+        while len(_connections) > MAX_CONNECTIONS:
+            closed.append(_connections.pop(next(iter(_connections))))
+    for old in closed:
+        old.close()
+    return connection
+
+
+def close_connection(target: str) -> None:
+    """Close the connection to ``target`` if one is open, without opening one"""
+    with _connections_lock:
+        connection = _connections.pop(target, None)
+    if connection is not None:
+        connection.close()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Call metrics of the MCP tools and the data load.
+
+Every instrumented call records its latency into a fixed log-spaced
+histogram (so p50/p95/p99 cost O(buckets) to read and nothing per call to
+keep), the rows it scanned, the size of its result and how much it raised
+the process peak RSS. Calls of the same name are aggregated; nothing per
+call is retained. When disabled, wrappers only check a flag.
+"""
+
+import functools
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from result_cache import result_size
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds of the latency buckets: 100 µs to ~100 s, 8 buckets per decade
+LATENCY_BOUNDS = [10 ** (exponent / 8) for exponent in range(-32, 17)]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the process in bytes, None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class CallStats:
+    """Aggregated metrics of one tool or phase; updated under the owning Metrics lock"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BOUNDS) + 1)  # the last one is +Inf
+        self.rows = 0
+        self.result_bytes = 0
+        self.rss_growth = 0
+
+    def add(self, seconds: float, rows: int, result_bytes: int, rss_growth: int, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[_bucket(seconds)] += 1
+        self.rows += rows
+        self.result_bytes += result_bytes
+        self.rss_growth += rss_growth
+
+    def quantile(self, q: float) -> float:
+        """Latency below which a fraction ``q`` of the calls fell, interpolated within its bucket"""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                if i == len(LATENCY_BOUNDS):
+                    return self.max_seconds
+                upper = LATENCY_BOUNDS[i]
+                lower = LATENCY_BOUNDS[i - 1] if i else 0.0
+                # Log-linear within the bucket, never beyond the slowest call seen
+                fraction = (rank - seen) / count
+                value = lower * (upper / lower) ** fraction if lower else upper * fraction
+                return min(value, self.max_seconds)
+            seen += count
+        return self.max_seconds
+
+    def summary(self) -> dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': self.seconds,
+            'mean_seconds': self.seconds / self.calls if self.calls else 0.0,
+            'max_seconds': self.max_seconds,
+            **{f"p{round(q * 100)}_seconds": self.quantile(q) for q in QUANTILES},
+            'rows_scanned': self.rows,
+            'result_bytes': self.result_bytes,
+            'peak_rss_growth_bytes': self.rss_growth,
+        }
+
+
+def _bucket(seconds: float) -> int:
+    """Index of the first bucket whose upper bound is >= ``seconds``"""
+    if seconds <= LATENCY_BOUNDS[0]:
+        return 0
+    return min(max(math.ceil(8 * math.log10(seconds) + 32 - 1e-9), 0), len(LATENCY_BOUNDS))
+
+
+class Metrics:
+    """Thread-safe registry of CallStats keyed on tool or phase name"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._local = threading.local()
+
+    def instrument(self, func: Callable = None, *, name: str = None,
+                   rows: Callable[[object], int] = None) -> Callable:
+        """Wrap a synchronous ``func`` so each call is recorded under ``name`` (default: its name)
+
+        Rows scanned are what the call reported through ``scanned``, else
+        ``rows(result)`` when given; they also count towards any instrumented
+        call or timer enclosing this one. Usable as ``@instrument`` or ``@instrument(...)``.
+        """
+        if func is None:
+            return lambda func: self.instrument(func, name=name, rows=rows)
+        key = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            outer = getattr(self._local, 'rows', None)
+            self._local.rows = 0
+            rss = peak_rss()
+            started = time.perf_counter()
+            result, failed = None, True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                scanned = self._local.rows
+                if not scanned and rows is not None and not failed:
+                    scanned = rows(result)
+                self._resume(outer, scanned)
+                self.record(key, elapsed, scanned, result_size(result), _growth(rss), failed)
+
+        return wrapper
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the block as one call of ``name``; rows come from ``scanned`` calls inside it"""
+        if not self.enabled:
+            yield
+            return
+        outer = getattr(self._local, 'rows', None)
+        self._local.rows = 0
+        rss = peak_rss()
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - started
+            scanned = self._local.rows
+            self._resume(outer, scanned)
+            self.record(name, elapsed, scanned, 0, _growth(rss), failed)
+
+    def _resume(self, outer: Optional[int], scanned: int) -> None:
+        """Restore the rows counter of the enclosing call, if any, adding the rows of the nested one"""
+        self._local.rows = None if outer is None else outer + scanned
+
+    def scanned(self, rows: int) -> None:
+        """Note that the instrumented call running in this thread scanned ``rows`` rows"""
+        if self.enabled and getattr(self._local, 'rows', None) is not None:
+            self._local.rows += rows
+
+    def record(self, name: str, seconds: float, rows: int = 0, result_bytes: int = 0,
+               rss_growth: int = 0, failed: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = CallStats()
+            stats.add(seconds, rows, result_bytes, rss_growth, failed)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> dict:
+        """{name: summary} of every tool and phase called so far"""
+        with self._lock:
+            return {name: stats.summary() for name, stats in sorted(self._stats.items())}
+
+    def prometheus(self, prefix: str = "netflix") -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            stats = sorted((name, stats.summary(), list(stats.buckets)) for name, stats in self._stats.items())
+        lines = [
+            f"# HELP {prefix}_call_duration_seconds Latency of tool calls and data load phases.",
+            f"# TYPE {prefix}_call_duration_seconds histogram",
+        ]
+        for name, summary, buckets in stats:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BOUNDS + [math.inf], buckets):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:.6g}"
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{name="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_call_duration_seconds_sum{{name="{name}"}} {summary["total_seconds"]:.6f}')
+            lines.append(f'{prefix}_call_duration_seconds_count{{name="{name}"}} {summary["calls"]}')
+        counters = [
+            ('call_errors_total', 'errors', "Calls that raised."),
+            ('rows_scanned_total', 'rows_scanned', "Rows scanned by calls."),
+            ('result_bytes_total', 'result_bytes', "UTF-8 bytes of call results."),
+            ('peak_rss_growth_bytes_total', 'peak_rss_growth_bytes', "Growth of the process peak RSS during calls."),
+        ]
+        for metric, field, help_text in counters:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            lines.extend(f'{prefix}_{metric}{{name="{name}"}} {summary[field]}' for name, summary, _ in stats)
+        rss = peak_rss()
+        if rss is not None:
+            lines.append(f"# HELP {prefix}_peak_rss_bytes Peak resident set size of the server process.")
+            lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+            lines.append(f"{prefix}_peak_rss_bytes {rss}")
+        return "\n".join(lines) + "\n"
+
+
+def _growth(before: Optional[int]) -> int:
+    after = peak_rss()
+    return after - before if before is not None and after is not None else 0
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Memoization of MCP tool results.
+
+Results are keyed on the tool name, its bound arguments and the identity of
+the dataset they were computed from, so a new dataset never serves stale
+answers. Entries expire after a TTL and the least recently used ones are
+evicted once the entry or byte budget is exceeded.
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+
+class ResultCache:
+    """Thread-safe LRU cache of tool results with a TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, result), least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def memoize(self, func: Callable, version: Callable[[], str]) -> Callable:
+        """Wrap ``func`` so that calls with the same arguments and ``version()`` are answered from the cache"""
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            current = version()
+            key = (func.__name__, json.dumps(bound.arguments, sort_keys=True, default=repr), current)
+            found, result = self.get(key)
+            if found:
+                return result
+            result = func(*args, **kwargs)
+            # Not stored if the dataset changed while the result was computed
+            if version() == current:
+                self.put(key, result)
+            return result
+
+        return wrapper
+
+    def get(self, key) -> tuple[bool, object]:
+        """(True, result) for a live entry, else (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def put(self, key, result) -> None:
+        size = result_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, result)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _remove(self, key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def result_size(result) -> int:
+    """Approximate size of a tool result: its text in UTF-8; 0 for results without text"""
+    if isinstance(result, list):
+        return sum(result_size(item) for item in result)
+    text = getattr(result, 'text', None)
+    if text is None and hasattr(result, 'content'):
+        # Structured results: the JSON text stands for the structured content too
+        text = "".join(getattr(block, 'text', '') for block in result.content)
+    if text is None:
+        text = result if isinstance(result, str) else ''
+    return len(text.encode('utf-8'))
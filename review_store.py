@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar in-memory store for the Netflix reviews dataset.
+
+Every review column is parsed once at load time into a typed array so the
+analysis tools can run vectorized passes instead of re-parsing strings.
+The store can be saved as a binary snapshot (one ``.npy`` file per column,
+strings kept as an offsets array plus a UTF-8 heap) and memory-mapped back,
+so a cold start costs page faults rather than a full parse.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+import config
+
+if TYPE_CHECKING:
+    # Imported where CSV data is parsed, so serving a snapshot never loads pandas
+    import pandas as pd
+
+# Columns of the source CSV, in file order
+COLUMNS = [
+    'reviewId',
+    'userName',
+    'content',
+    'score',
+    'thumbsUpCount',
+    'reviewCreatedVersion',
+    'at',
+    'appVersion'
+]
+
+# Sentinel stored in the score / thumbsUpCount columns when the raw value is
+# missing or not an integer (or, for scores, outside config.VALID_SCORES)
+MISSING = -1
+
+# Snapshot layout; bump SCHEMA_VERSION whenever the columns or their encoding change
+SCHEMA_VERSION = 2
+SNAPSHOT_META = "meta.json"
+NUMERIC_COLUMNS = ['user_codes', 'score', 'thumbs', 'created_codes', 'at',
+                   'version_codes', 'content_len', 'word_count', 'present']
+STRING_COLUMNS = ['review_id', 'user_names', 'content', 'created_names', 'version_names']
+
+# Layout of the ``at`` values written by the scraper; anything else goes through the ISO 8601 parser
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Trailing UTC offset of an ISO 8601 timestamp
+_OFFSET_PATTERN = r'(?:[Zz]|[+-]\d{2}:?\d{2})$'
+
+# Bytes hashed from each end of the source file when fingerprinting it
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+
+class StaleSnapshotError(ValueError):
+    """Snapshot was built by another schema version or from a different source file"""
+
+
+def source_fingerprint(path: Path) -> dict:
+    """Cheap identity of a source file: size, mtime and a hash of its first and last MiB"""
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(FINGERPRINT_SAMPLE_BYTES, stat.st_size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sample_hash': digest.hexdigest(),
+    }
+
+
+def parse_timestamps(values: "pd.Series", timezone: str = 'UTC') -> tuple[np.ndarray, int]:
+    """Parse timestamp strings into datetime64[s] wall-clock times in ``timezone``
+
+    Values in TIMESTAMP_FORMAT take the fixed-format path. Only the rest are
+    parsed as ISO 8601; those with a UTC offset are converted into
+    ``timezone``, naive ones are taken to be in it already. Returns the times
+    (NaT where blank or malformed) and the number of malformed values.
+    """
+    import pandas as pd
+    parsed = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors='coerce').to_numpy(dtype='datetime64[s]')
+    retry = np.isnat(parsed) & (values.str.strip().str.len().to_numpy() > 0)
+    if retry.any():
+        rows = np.flatnonzero(retry)
+        rest = values.iloc[rows].str.strip()
+        aware = rest.str.contains(_OFFSET_PATTERN).to_numpy(dtype=bool)
+        naive = pd.to_datetime(rest[~aware], format='ISO8601', errors='coerce')
+        parsed[rows[~aware]] = naive.to_numpy(dtype='datetime64[s]')
+        if aware.any():
+            utc = pd.to_datetime(rest[aware], format='ISO8601', errors='coerce', utc=True)
+            parsed[rows[aware]] = utc.dt.tz_convert(timezone).dt.tz_localize(None).to_numpy(dtype='datetime64[s]')
+    return parsed, int(np.count_nonzero(retry & np.isnat(parsed)))
+
+
+class StringColumn:
+    """Immutable column of strings stored as UTF-8 bytes in one contiguous heap.
+
+    ``offsets`` has one more entry than there are strings; string ``i`` is
+    ``heap[offsets[i]:offsets[i + 1]]``. Both arrays may be memory-mapped.
+    """
+
+    def __init__(self, offsets: np.ndarray, heap: np.ndarray):
+        self.offsets = offsets
+        self.heap = heap
+        self._view = memoryview(heap)
+
+    @classmethod
+    def from_strings(cls, values) -> "StringColumn":
+        """Pack an iterable of strings into a heap"""
+        encoded = [str(v).encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        heap = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(offsets, heap)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> str:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return str(self._view[start:end], 'utf-8')
+
+    def __iter__(self):
+        view = self._view
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield str(view[start:end], 'utf-8')
+
+    def tolist(self) -> list[str]:
+        return list(self)
+
+    def slice(self, start: int, stop: int) -> "StringColumn":
+        """Strings ``start:stop`` as a view sharing this column's heap"""
+        return StringColumn(self.offsets[start:stop + 1], self.heap)
+
+    def take(self, indices: np.ndarray) -> "StringSelection":
+        """Strings at ``indices``, read through this column's heap"""
+        return StringSelection(self, indices)
+
+
+class StringSelection:
+    """Read-only strings of a StringColumn at given positions; nothing is copied"""
+
+    def __init__(self, column: StringColumn, indices: np.ndarray):
+        self.column = column
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i) -> str:
+        return self.column[self.indices[i]]
+
+    def __iter__(self):
+        view = self.column._view
+        offsets = self.column.offsets
+        for start, end in zip(offsets[self.indices].tolist(), offsets[np.asarray(self.indices) + 1].tolist()):
+            yield str(view[start:end], 'utf-8')
+
+    def tolist(self) -> list[str]:
+        return list(self)
+
+
+class ReviewStore:
+    """Typed, column-oriented view of the reviews dataset.
+
+    Columns:
+        review_id        reviewId strings
+        user_codes       int32 codes into ``user_names``
+        content          review texts
+        score            int8 rating, ``MISSING`` when unparsable or not in config.VALID_SCORES
+        thumbs           int32 thumbs up count, ``MISSING`` when unparsable
+        created_codes    int32 codes into ``created_names``
+        at               datetime64[s] review time: int64 seconds since the epoch of the
+                         wall-clock time in config.TIMEZONE, NaT when blank or malformed
+        version_codes    int32 codes into ``version_names``
+        content_len      int32 characters per review
+        word_count       int32 whitespace separated words per review
+        present          uint8 bitmask, bit ``i`` set when ``COLUMNS[i]`` is non-blank
+    """
+
+    def __init__(self, review_id, user_codes, user_names, content, score, thumbs,
+                 created_codes, created_names, at, version_codes, version_names,
+                 content_len, word_count, present):
+        self.review_id = review_id
+        self.user_codes = user_codes
+        self.user_names = user_names
+        self.content = content
+        self.score = score
+        self.thumbs = thumbs
+        self.created_codes = created_codes
+        self.created_names = created_names
+        self.at = at
+        self.version_codes = version_codes
+        self.version_names = version_names
+        self.content_len = content_len
+        self.word_count = word_count
+        self.present = present
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+    @classmethod
+    def empty(cls) -> "ReviewStore":
+        """Store with no rows"""
+        import pandas as pd
+        return cls.from_frame(pd.DataFrame(columns=COLUMNS, dtype=str))
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "ReviewStore":
+        """Parse a reviews CSV into typed columns"""
+        import pandas as pd
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False, encoding='utf-8')
+        return cls.from_frame(frame)
+
+    @classmethod
+    def from_frame(cls, frame: "pd.DataFrame") -> "ReviewStore":
+        """Build a store from a DataFrame of raw string columns"""
+        frame = frame.reindex(columns=COLUMNS, fill_value='')
+
+        present = np.zeros(len(frame), dtype=np.uint8)
+        for bit, col in enumerate(COLUMNS):
+            non_blank = frame[col].str.strip().str.len().to_numpy() > 0
+            present |= non_blank.astype(np.uint8) << bit
+
+        content = frame['content']
+        user_codes, user_names = _factorize(frame['userName'])
+        created_codes, created_names = _factorize(frame['reviewCreatedVersion'])
+        version_codes, version_names = _factorize(frame['appVersion'])
+
+        return cls(
+            review_id=StringColumn.from_strings(frame['reviewId']),
+            user_codes=user_codes,
+            user_names=StringColumn.from_strings(user_names),
+            content=StringColumn.from_strings(content),
+            score=_parse_int(frame['score'], np.int8, min(config.VALID_SCORES), max(config.VALID_SCORES)),
+            thumbs=_parse_int(frame['thumbsUpCount'], np.int32),
+            created_codes=created_codes,
+            created_names=created_names,
+            at=parse_timestamps(frame['at'], config.TIMEZONE)[0],
+            version_codes=version_codes,
+            version_names=version_names,
+            content_len=content.str.len().to_numpy(dtype=np.int32),
+            word_count=content.str.split().str.len().to_numpy(dtype=np.int32),
+            present=present,
+        )
+
+    @classmethod
+    def open(cls, directory: Path, source: dict = None) -> "ReviewStore":
+        """Memory-map a snapshot written by :meth:`save`
+
+        Raises StaleSnapshotError if the snapshot has another schema version or
+        timezone or, when ``source`` is given, was built from a file with another
+        fingerprint.
+        """
+        directory = Path(directory)
+        meta = snapshot_meta(directory)
+        if meta.get('schema_version') != SCHEMA_VERSION:
+            raise StaleSnapshotError(f"schema version {meta.get('schema_version')} != {SCHEMA_VERSION}")
+        if meta.get('timezone') != config.TIMEZONE:
+            raise StaleSnapshotError(f"timestamps are in {meta.get('timezone')}, not {config.TIMEZONE}")
+        if source is not None and meta.get('source') != source:
+            raise StaleSnapshotError("source file changed since the snapshot was built")
+
+        columns = {
+            name: np.load(directory / f"{name}.npy", mmap_mode='r')
+            for name in NUMERIC_COLUMNS
+        }
+        for name in STRING_COLUMNS:
+            column = StringColumn(
+                np.load(directory / f"{name}.offsets.npy", mmap_mode='r'),
+                np.load(directory / f"{name}.heap.npy", mmap_mode='r'),
+            )
+            # Small category tables are decoded eagerly for cheap lookups
+            columns[name] = column.tolist() if name in ('created_names', 'version_names') else column
+
+        store = cls(**columns)
+        if len(store) != meta['rows']:
+            raise ValueError(f"Snapshot {directory} is truncated")
+        return store
+
+    def save(self, directory: Path, source: dict = None) -> None:
+        """Write the store as a binary snapshot directory, replacing any existing one
+
+        ``source`` is the fingerprint of the file the store was parsed from.
+        """
+        directory = Path(directory)
+        tmp = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        for name in NUMERIC_COLUMNS:
+            np.save(tmp / f"{name}.npy", np.asarray(getattr(self, name)))
+        for name in STRING_COLUMNS:
+            column = getattr(self, name)
+            if not isinstance(column, StringColumn):
+                column = StringColumn.from_strings(column)
+            np.save(tmp / f"{name}.offsets.npy", column.offsets)
+            np.save(tmp / f"{name}.heap.npy", column.heap)
+
+        # meta.json is written last: a snapshot without it is incomplete
+        _write_meta(tmp, {'schema_version': SCHEMA_VERSION, 'rows': len(self), 'source': source,
+                          'timezone': config.TIMEZONE})
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+
+    def slice(self, start: int, stop: int) -> "ReviewStore":
+        """Rows ``start:stop`` as a view; category tables are shared, so codes stay valid"""
+        return ReviewStore(
+            review_id=self.review_id.slice(start, stop),
+            user_codes=self.user_codes[start:stop],
+            user_names=self.user_names,
+            content=self.content.slice(start, stop),
+            score=self.score[start:stop],
+            thumbs=self.thumbs[start:stop],
+            created_codes=self.created_codes[start:stop],
+            created_names=self.created_names,
+            at=self.at[start:stop],
+            version_codes=self.version_codes[start:stop],
+            version_names=self.version_names,
+            content_len=self.content_len[start:stop],
+            word_count=self.word_count[start:stop],
+            present=self.present[start:stop],
+        )
+
+    def take(self, rows: np.ndarray) -> "ReviewStore":
+        """Rows ``rows`` as a new store; category tables are shared, so codes stay valid
+
+        String columns are StringSelections over this store's heaps, not copies.
+        """
+        return ReviewStore(
+            review_id=self.review_id.take(rows),
+            user_codes=self.user_codes[rows],
+            user_names=self.user_names,
+            content=self.content.take(rows),
+            score=self.score[rows],
+            thumbs=self.thumbs[rows],
+            created_codes=self.created_codes[rows],
+            created_names=self.created_names,
+            at=self.at[rows],
+            version_codes=self.version_codes[rows],
+            version_names=self.version_names,
+            content_len=self.content_len[rows],
+            word_count=self.word_count[rows],
+            present=self.present[rows],
+        )
+
+    def row(self, i: int) -> dict:
+        """Reassemble row ``i`` as a dict keyed by CSV column"""
+        at = self.at[i]
+        return {
+            'reviewId': self.review_id[i],
+            'userName': self.user_names[self.user_codes[i]],
+            'content': self.content[i],
+            'score': int(self.score[i]) if self.score[i] != MISSING else None,
+            'thumbsUpCount': int(self.thumbs[i]) if self.thumbs[i] != MISSING else None,
+            'reviewCreatedVersion': self.created_names[self.created_codes[i]],
+            'at': str(at).replace('T', ' ') if not np.isnat(at) else None,
+            'appVersion': self.version_names[self.version_codes[i]],
+        }
+
+    def schema(self) -> dict[str, str]:
+        """Storage type of each CSV column"""
+        return {
+            'reviewId': 'str',
+            'userName': f'category[{len(self.user_names)}]',
+            'content': 'str',
+            'score': str(self.score.dtype),
+            'thumbsUpCount': str(self.thumbs.dtype),
+            'reviewCreatedVersion': f'category[{len(self.created_names)}]',
+            'at': str(self.at.dtype),
+            'appVersion': f'category[{len(self.version_names)}]',
+        }
+
+
+def snapshot_meta(directory: Path) -> dict:
+    """Contents of a snapshot's meta.json"""
+    with open(Path(directory) / SNAPSHOT_META, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def append_snapshot(directory: Path, columns: dict, source: dict = None) -> None:
+    """Append rows to a snapshot in place, in time proportional to the rows added
+
+    ``columns`` maps every name in NUMERIC_COLUMNS to an array of new values
+    and every name in STRING_COLUMNS to a StringColumn of new strings (for the
+    ``*_names`` category tables: only categories first seen in these rows).
+    Codes must already refer to the snapshot's category tables. ``source`` is
+    the fingerprint of the source file once it contains the new rows.
+    """
+    directory = Path(directory)
+    meta = snapshot_meta(directory)
+    rows = len(columns['score'])
+
+    for name in NUMERIC_COLUMNS:
+        _append_npy(directory / f"{name}.npy", np.asarray(columns[name]))
+    for name in STRING_COLUMNS:
+        heap_path = directory / f"{name}.heap.npy"
+        heap_size = _append_npy(heap_path, columns[name].heap) - len(columns[name].heap)
+        _append_npy(directory / f"{name}.offsets.npy", columns[name].offsets[1:] + heap_size)
+
+    # Column files ignore bytes past their header's shape, so the snapshot
+    # only grows once meta.json is replaced with the new row count
+    meta.update(rows=meta['rows'] + rows, source=source)
+    _write_meta(directory, meta)
+
+
+def _append_npy(path: Path, values: np.ndarray) -> int:
+    """Append values to a 1-d .npy file by rewriting only its shape header; returns the new length"""
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+        length = shape[0] + len(values)
+
+        # Overwrite anything past the current shape (e.g. left by an interrupted append)
+        f.seek(data_offset + shape[0] * dtype.itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        f.truncate()
+
+        # np.save pads headers so the shape can grow in place
+        prefix = 10 if version == (1, 0) else 12
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+            np.lib.format.dtype_to_descr(dtype), length)
+        room = data_offset - prefix - 1
+        if len(header) > room:
+            raise ValueError(f"No room to grow the header of {path}")
+        f.seek(prefix)
+        f.write((header.ljust(room) + '\n').encode('latin1'))
+    return length
+
+
+def _write_meta(directory: Path, meta: dict) -> None:
+    """Atomically replace a snapshot's meta.json"""
+    tmp = directory / f"{SNAPSHOT_META}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, directory / SNAPSHOT_META)
+
+
+def _factorize(values: "pd.Series") -> tuple[np.ndarray, list[str]]:
+    """Dictionary-encode a string column, categories in first-seen order"""
+    import pandas as pd
+    codes, uniques = pd.factorize(values, sort=False)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def _parse_int(values: "pd.Series", dtype, low=None, high=None) -> np.ndarray:
+    """Parse an integer column, storing ``MISSING`` for blank or invalid values
+    
+    Values outside ``[low, high]`` (default: the range of ``dtype``) are invalid.
+    """
+    import pandas as pd
+    parsed = pd.to_numeric(values.str.strip(), errors='coerce')
+    info = np.iinfo(dtype)
+    low = info.min if low is None else low
+    high = info.max if high is None else high
+    valid = parsed.notna() & (parsed == parsed.round()) & parsed.between(low, high)
+    return parsed.where(valid, MISSING).to_numpy(dtype=dtype)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Time-bucketed rollups of the reviews.
+
+At each granularity (day, week, month) the dated reviews are summed per
+(bucket, appVersion) cell: review count, score sum, score histogram and
+thumbs up sum. Cells are sorted by bucket, so a trend over any window is a
+binary search plus one reduction over the cells inside it, whatever the
+number of reviews. Like the other aggregates, rollups merge, so appended
+reviews only roll up the new rows.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+import config
+from review_store import MISSING, ReviewStore
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Scores are config.VALID_SCORES (1-5); histogram rows are indexed by score
+SCORE_BINS = max(config.VALID_SCORES) + 1
+
+
+def bucket_starts(days: np.ndarray, granularity: str) -> np.ndarray:
+    """First day of the ``granularity`` bucket of each datetime64[D] in ``days`` (weeks start on Monday)"""
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday
+        return days - (days.view(np.int64) + 3) % 7
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Unknown granularity {granularity!r}, expected one of {', '.join(GRANULARITIES)}")
+
+
+class Rollup:
+    """Sums per (bucket, appVersion) cell at one granularity, cells sorted by bucket then version"""
+
+    def __init__(self, buckets, versions, count, score_sum, score_hist, thumbs_sum):
+        self.buckets = buckets
+        self.versions = versions
+        self.count = count
+        self.score_sum = score_sum
+        # score_hist[cell, s] reviews with score s
+        self.score_hist = score_hist
+        self.thumbs_sum = thumbs_sum
+
+    @classmethod
+    def build(cls, buckets: np.ndarray, versions: np.ndarray, score: np.ndarray, thumbs: np.ndarray) -> "Rollup":
+        """Roll up one row per entry: bucket start (datetime64[D]), version code, score and thumbs"""
+        cell_buckets, cell_versions, cells = _cells(buckets, versions)
+        n = len(cell_buckets)
+        # Out-of-range scores would land in the next cell's histogram; count them as unrated
+        rated = (score >= min(config.VALID_SCORES)) & (score < SCORE_BINS)
+        valid_thumbs = thumbs != MISSING
+        score_hist = np.bincount(cells[rated] * SCORE_BINS + score[rated], minlength=n * SCORE_BINS)
+        return cls(
+            buckets=cell_buckets,
+            versions=cell_versions,
+            count=np.bincount(cells, minlength=n),
+            score_sum=np.bincount(cells[rated], weights=score[rated], minlength=n).astype(np.int64),
+            score_hist=score_hist.reshape(n, SCORE_BINS),
+            thumbs_sum=np.bincount(cells[valid_thumbs], weights=thumbs[valid_thumbs], minlength=n).astype(np.int64),
+        )
+
+    def merged(self, other: "Rollup") -> "Rollup":
+        """Rollup of both sets of rows (version codes in the same table)"""
+        cell_buckets, cell_versions, cells = _cells(np.concatenate([self.buckets, other.buckets]),
+                                                    np.concatenate([self.versions, other.versions]))
+        n = len(cell_buckets)
+
+        def total(a, b):
+            return np.bincount(cells, weights=np.concatenate([a, b]), minlength=n).astype(np.int64)
+
+        return Rollup(
+            buckets=cell_buckets,
+            versions=cell_versions,
+            count=total(self.count, other.count),
+            score_sum=total(self.score_sum, other.score_sum),
+            score_hist=np.stack([total(self.score_hist[:, s], other.score_hist[:, s]) for s in range(SCORE_BINS)],
+                                axis=1),
+            thumbs_sum=total(self.thumbs_sum, other.thumbs_sum),
+        )
+
+
+class RollupCube:
+    """Day, week and month rollups of one store"""
+
+    def __init__(self, rollups: dict):
+        self.rollups = rollups
+
+    @classmethod
+    def build(cls, store: ReviewStore) -> "RollupCube":
+        dated = ~np.isnat(store.at)
+        days = store.at[dated].astype('datetime64[D]')
+        versions = store.version_codes[dated]
+        score = store.score[dated].astype(np.int64)
+        thumbs = store.thumbs[dated].astype(np.int64)
+        return cls({granularity: Rollup.build(bucket_starts(days, granularity), versions, score, thumbs)
+                    for granularity in GRANULARITIES})
+
+    def merged(self, other: "RollupCube") -> "RollupCube":
+        return RollupCube({granularity: self.rollups[granularity].merged(other.rollups[granularity])
+                           for granularity in GRANULARITIES})
+
+    def series(self, granularity: str, start: Optional[np.datetime64] = None, stop: Optional[np.datetime64] = None,
+               versions: Optional[np.ndarray] = None) -> dict:
+        """Per-bucket sums over the reviews dated in ``[start, stop)``
+
+        ``start`` and ``stop`` are datetime64[D] or None for an open end;
+        ``versions`` is a boolean mask over appVersion codes, None for all.
+        Returns arrays keyed buckets, count, score_sum, score_hist, thumbs_sum,
+        one entry per bucket with reviews, oldest first. Windows that do not
+        start and end on ``granularity`` buckets are summed from the day rollup.
+        """
+        aligned = all(bound is None or bucket_starts(np.array([bound], dtype='datetime64[D]'), granularity)[0] == bound
+                      for bound in (start, stop))
+        rollup = self.rollups[granularity if aligned else 'day']
+        lo = 0 if start is None else np.searchsorted(rollup.buckets, start, side='left')
+        hi = len(rollup.buckets) if stop is None else np.searchsorted(rollup.buckets, stop, side='left')
+        cells = np.arange(lo, hi) if versions is None else lo + np.flatnonzero(versions[rollup.versions[lo:hi]])
+
+        buckets = bucket_starts(rollup.buckets[cells], granularity)
+        if not len(buckets):
+            return {'buckets': buckets, 'count': np.zeros(0, dtype=np.int64), 'score_sum': np.zeros(0, dtype=np.int64),
+                    'score_hist': np.zeros((0, SCORE_BINS), dtype=np.int64), 'thumbs_sum': np.zeros(0, dtype=np.int64)}
+        # Cells are in bucket order: each run of equal buckets is one output bucket
+        firsts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+        return {
+            'buckets': buckets[firsts],
+            'count': np.add.reduceat(rollup.count[cells], firsts),
+            'score_sum': np.add.reduceat(rollup.score_sum[cells], firsts),
+            'score_hist': np.add.reduceat(rollup.score_hist[cells], firsts, axis=0),
+            'thumbs_sum': np.add.reduceat(rollup.thumbs_sum[cells], firsts),
+        }
+
+
+def _cells(buckets: np.ndarray, versions: np.ndarray) -> tuple:
+    """(bucket, version) of each distinct cell in bucket-then-version order, and the cell of every entry"""
+    width = int(versions.max()) + 1 if len(versions) else 1
+    keys, cells = np.unique(buckets.view(np.int64) * width + versions, return_inverse=True)
+    return (keys // width).view('datetime64[D]'), (keys % width).astype(np.int32), cells
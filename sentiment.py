@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Lexicon-based sentiment classification shared by the server and the Streamlit app.
+
+A review is positive when its lowercased content contains a keyword of
+config.POSITIVE_KEYWORDS (as a substring) and none of config.NEGATIVE_KEYWORDS,
+negative in the opposite case and neutral otherwise. Each lexicon is compiled
+into a single alternation regex, so a review costs one search per lexicon
+instead of one substring scan per keyword. The server classifies every review
+once per dataset, from the keyword index vocabulary when it can, and the tools
+only count the cached per-row flags.
+"""
+
+import re
+
+import numpy as np
+
+import config
+
+# Per-row lexicon hit flags
+POSITIVE = 1
+NEGATIVE = 2
+
+# Sentiment label of each flag value (hits in both lexicons are neutral)
+LABELS = np.array(['neutral', 'positive', 'negative', 'neutral'])
+
+
+def compile_lexicon(words) -> re.Pattern:
+    """One regex matching any of ``words``, longest first"""
+    words = sorted({word.lower() for word in words}, key=lambda word: (-len(word), word))
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+
+POSITIVE_PATTERN = compile_lexicon(config.POSITIVE_KEYWORDS)
+NEGATIVE_PATTERN = compile_lexicon(config.NEGATIVE_KEYWORDS)
+
+# When every keyword is a single run of letters, a keyword occurs in a text
+# exactly when it occurs in one of the text's letter runs, so flags can be
+# computed from an index vocabulary instead of the text
+LETTERS_ONLY = all(re.fullmatch(r'[a-z]+', word.lower())
+                   for word in config.POSITIVE_KEYWORDS | config.NEGATIVE_KEYWORDS)
+
+
+def text_flags(texts: list) -> np.ndarray:
+    """Lexicon hit flags of already lowercased ``texts``, one regex search per text and lexicon"""
+    flags = np.zeros(len(texts), dtype=np.uint8)
+    for pattern, bit in ((POSITIVE_PATTERN, POSITIVE), (NEGATIVE_PATTERN, NEGATIVE)):
+        search = pattern.search
+        flags[np.fromiter((search(text) is not None for text in texts), dtype=bool, count=len(texts))] |= bit
+    return flags
+
+
+def store_flags(store, index, start: int = 0) -> np.ndarray:
+    """Lexicon hit flags of every row of ``store``, whose first row is ``start`` in ``index``"""
+    if not LETTERS_ONLY:
+        # Lowercased BATCH_SIZE rows at a time, so a large store's text is never copied whole
+        step = config.BATCH_SIZE
+        return np.concatenate([np.zeros(0, dtype=np.uint8)] + [
+            text_flags([text.lower() for text in store.content.slice(lo, min(lo + step, len(store)))])
+            for lo in range(0, len(store), step)
+        ])
+    flags = np.zeros(len(store), dtype=np.uint8)
+    flags[index.rows_matching(POSITIVE_PATTERN) - start] |= POSITIVE
+    flags[index.rows_matching(NEGATIVE_PATTERN) - start] |= NEGATIVE
+    return flags
+
+
+def sentiment_counts(flags: np.ndarray) -> tuple[int, int, int]:
+    """(positive, negative, neutral) counts of rows with the given flags"""
+    counts = np.bincount(flags, minlength=4)
+    return int(counts[POSITIVE]), int(counts[NEGATIVE]), int(len(flags) - counts[POSITIVE] - counts[NEGATIVE])
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel build of the per-dataset text analyses.
+
+Tokenizing, indexing and classifying the review texts is the pure-Python part
+of building a Dataset. Here the rows are split into contiguous shards and each
+worker process maps one shard: it memory-maps the binary snapshot itself (the
+pages are shared through the OS page cache, nothing is pickled on the way in)
+and returns the shard's Aggregates, index segment and sentiment flags. The
+reduce step uses the same merges as incremental ingestion.
+
+Workers are started with the spawn method, only for a build that is large
+enough to use them: forking a process that already runs threads (the event
+loop, the tool pool) can leave a child blocked on a lock held at fork time.
+Spawned workers import the server script again, which starts no thread and
+loads no data at import.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from aggregates import Aggregates
+from review_store import ReviewStore
+from sentiment import store_flags
+from text_index import InvertedIndex
+
+
+def shard_bounds(rows: int, shards: int) -> list:
+    """``shards`` contiguous (start, stop) row ranges covering ``rows``"""
+    edges = np.linspace(0, rows, shards + 1).astype(int).tolist()
+    return [(start, stop) for start, stop in zip(edges, edges[1:]) if stop > start]
+
+
+def build_shard(directory: str, source: dict, start: int, stop: int) -> tuple:
+    """Map step: aggregates, index and sentiment flags of rows ``start:stop`` of a snapshot"""
+    shard = ReviewStore.open(Path(directory), source).slice(start, stop)
+    index = InvertedIndex.build(shard, start)
+    return Aggregates.build(shard), index, store_flags(shard, index, start)
+
+
+def build_parallel(directory: Path, source: dict, rows: int, workers: int) -> tuple:
+    """(aggregates, index, sentiment) of a snapshot of ``rows`` rows, built by ``workers`` processes"""
+    bounds = shard_bounds(rows, workers)
+    with ProcessPoolExecutor(max_workers=len(bounds), mp_context=multiprocessing.get_context('spawn')) as pool:
+        parts = list(pool.map(build_shard, *zip(*[(str(directory), source, start, stop) for start, stop in bounds])))
+
+    # Reduce step, in row order
+    aggregates, index, flags = parts[0]
+    sentiment = [flags]
+    for shard_aggregates, shard_index, shard_flags in parts[1:]:
+        aggregates = aggregates.merged(shard_aggregates)
+        index = InvertedIndex(index.segments + shard_index.segments)
+        sentiment.append(shard_flags)
+    return aggregates, index.compacted(), np.concatenate(sentiment)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Out-of-core build of a Dataset.
+
+The CSV is never parsed as a whole. It is read in chunks of BATCH_SIZE rows
+that flow through a generator pipeline: each chunk is parsed, its category
+codes are mapped into the global tables, it is appended to the binary snapshot
+and its rows are added in place into the per-dataset state: the Aggregates
+arrays and token counts, and one inverted index sharing a single vocabulary.
+No batch is merged or copied into the totals, so a batch costs time in
+proportion to its own size. Only one chunk of raw text is in memory at a time;
+the finished snapshot is memory-mapped like any other, and the sentiment flags
+are read off the finished index.
+
+The aggregates grow with the lengths, users and versions seen, and the token
+counts with the vocabulary (with TOPICS_MODE = "approximate" they are a
+fixed-size sketch instead). The keyword index does grow with the data: its
+(token, row) postings are kept in memory, 8 bytes per distinct token of a
+review, as are the per-row sentiment flags. Streaming bounds the raw text and
+parsing overhead, not the size of the finished Dataset.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+from aggregates import Aggregates
+from dataset import Dataset
+from ingest import CATEGORIES, encode_delta
+from review_store import ReviewStore, append_snapshot
+from sentiment import store_flags
+from text_index import IndexBuilder
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def iter_batches(path: Path, batch_size: int) -> Iterator["pd.DataFrame"]:
+    """Raw string frames of at most ``batch_size`` rows of the CSV at ``path``"""
+    import pandas as pd
+    yield from pd.read_csv(path, dtype=str, keep_default_na=False, na_filter=False, encoding='utf-8',
+                           chunksize=batch_size)
+
+
+def snapshot_batches(frames: Iterator["pd.DataFrame"], directory: Path,
+                     source: dict) -> Iterator[tuple[int, ReviewStore]]:
+    """Append each frame to the snapshot in ``directory`` and yield (first row, rows as stored)"""
+    category_index = {names: {} for _, names in CATEGORIES}
+    rows = 0
+    for frame in frames:
+        columns = encode_delta(ReviewStore.from_frame(frame), category_index)
+        append_snapshot(directory, columns, source)
+        store = ReviewStore.open(directory, source)
+        yield rows, store.slice(rows, len(store))
+        rows = len(store)
+
+
+def build(path: Path, directory: Path, source: dict, batch_size: int) -> Dataset:
+    """Stream the CSV at ``path`` into a new snapshot in ``directory`` and analyze it
+
+    The snapshot is written next to ``directory`` and swapped in when complete.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(f"{directory.name}.stream-{os.getpid()}")
+    try:
+        ReviewStore.empty().save(tmp, source)
+        aggregates = None
+        index = IndexBuilder()
+        for _, batch in snapshot_batches(iter_batches(path, batch_size), tmp, source):
+            batch_aggregates = Aggregates.build(batch)
+            if aggregates is None:
+                aggregates = batch_aggregates
+            else:
+                aggregates.add(batch_aggregates)
+            index.add(batch)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    store = ReviewStore.open(directory, source)
+    if aggregates is None:
+        return Dataset(store, source)
+    aggregates.trim(store)
+    index = index.index()
+    return Dataset(store, source, aggregates, index, store_flags(store, index))
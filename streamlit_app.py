@@ -2,11 +2,19 @@ import streamlit as st
 import json
 import requests
 from typing import Any, Optional
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import os
 import sys
 
+import config
+from mcp_client import MCPConnection, close_connection, get_connection
+from filters import date_bounds
+from review_store import COLUMNS, parse_timestamps, source_fingerprint
+from sentiment import LABELS, NEGATIVE, POSITIVE, text_flags
+from versions import VersionIndex
+
 # Configure Streamlit page
 st.set_page_config(
     page_title="Netflix Data Analyzer Chatbot",
@@ -63,24 +71,109 @@ st.markdown("""
 
 # ============= HELPER FUNCTIONS =============
 
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.DATA_FILE)
+
+# Parse-time dtypes; score, thumbsUpCount and at are converted after parsing
+CSV_DTYPES = {
+    'reviewId': str,
+    'userName': 'category',
+    'content': str,
+    'reviewCreatedVersion': 'category',
+    'appVersion': 'category',
+}
+
+@st.cache_resource(max_entries=1, show_spinner="Loading Netflix reviews...")
+def load_reviews(path: str, fingerprint: tuple) -> pd.DataFrame:
+    """Parse the reviews CSV and precompute the columns the helpers use
+    
+    Cached process-wide per fingerprint, so every session shares one copy and a
+    changed file is parsed again exactly once. The frame is shared: treat it as
+    read-only.
+    """
+    # Only empty fields are missing: "NA" or "None" is a value, as in the server's store
+    df = pd.read_csv(path, dtype=CSV_DTYPES, encoding='utf-8', keep_default_na=False, na_values=[''])
+    # Bit i set when COLUMNS[i] is non-blank in the raw CSV, before any parsing
+    present = np.zeros(len(df), dtype=np.uint8)
+    for bit, col in enumerate(COLUMNS):
+        if col in df.columns:
+            non_blank = df[col].notna() & (df[col].astype(str).str.strip() != '')
+            present |= non_blank.to_numpy().astype(np.uint8) << bit
+    df['present'] = present
+    df['score'] = pd.to_numeric(df['score'], errors='coerce')
+    # Ratings outside VALID_SCORES count as missing, as in the server's store
+    df['score'] = df['score'].where(df['score'].isin(config.VALID_SCORES))
+    df['thumbsUpCount'] = pd.to_numeric(df['thumbsUpCount'], errors='coerce')
+    raw_at = df['at'].fillna('').astype(str)
+    df['at'], _ = parse_timestamps(raw_at, config.TIMEZONE)
+    df['at_malformed'] = df['at'].isna() & (raw_at.str.strip() != '')
+    
+    # Derived columns
+    content = df['content'].fillna('')
+    df['content_lower'] = content.str.lower()
+    df['content_length'] = content.str.len()
+    df['word_count'] = content.str.split().str.len()
+    df['sentiment_flags'] = text_flags(df['content_lower'].tolist())
+    df['sentiment'] = pd.Categorical(LABELS[df['sentiment_flags']])
+    df['date'] = df['at'].dt.date
+    return df
+
 def load_netflix_csv():
-    """Load Netflix CSV data"""
+    """Shared Netflix reviews dataframe, parsed again only when the CSV changes"""
     try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        csv_path = os.path.join(BASE_DIR, "netflix_data.csv")
-        df = pd.read_csv(csv_path)
-        return df
+        source = source_fingerprint(DATA_FILE)
+        return load_reviews(DATA_FILE, (source['size'], source['mtime_ns'], source['sample_hash']))
     except Exception as e:
         st.error(f"Error loading Netflix data: {e}")
         return None
 
-def get_score_distribution():
-    """Get score distribution analysis"""
+def filtered_reviews(filter: Optional[dict] = None):
+    """Shared reviews dataframe restricted to the rows matching ``filter`` (see filters.ReviewFilter)"""
     df = load_netflix_csv()
+    if df is None or not filter:
+        return df
+    
+    mask = pd.Series(True, index=df.index)
+    start, stop = date_bounds(filter)
+    if start is not None:
+        mask &= df['at'] >= pd.Timestamp(start)
+    if stop is not None:
+        mask &= df['at'] < pd.Timestamp(stop)
+    if filter.get('scores'):
+        mask &= df['score'].isin(filter['scores'])
+    if filter.get('min_thumbs') is not None:
+        mask &= df['thumbsUpCount'] >= max(int(filter['min_thumbs']), 0)
+    if filter.get('version_prefix'):
+        versions = df['appVersion'].cat.categories
+        mask &= df['appVersion'].isin(versions[versions.str.startswith(filter['version_prefix'])])
+    if filter.get('version_since') or filter.get('version_until'):
+        versions = df['appVersion'].cat.categories
+        in_range = VersionIndex(list(versions)).range(filter.get('version_since') or None,
+                                                      filter.get('version_until') or None)
+        mask &= df['appVersion'].isin(versions[in_range])
+    if filter.get('keyword'):
+        mask &= df['content_lower'].str.contains(filter['keyword'].lower(), regex=False)
+    return df[mask]
+
+def version_totals(df):
+    """VersionIndex of the appVersion categories and per-category review counts, rating counts and score sums"""
+    versions = VersionIndex(list(df['appVersion'].cat.categories))
+    codes = df['appVersion'].cat.codes.to_numpy()
+    scores = df['score'].to_numpy()
+    known = codes >= 0
+    rated = known & ~np.isnan(scores)
+    return (versions,
+            np.bincount(codes[known], minlength=versions.size),
+            np.bincount(codes[rated], minlength=versions.size),
+            np.bincount(codes[rated], weights=scores[rated], minlength=versions.size))
+
+def get_score_distribution(filter=None):
+    """Get score distribution analysis"""
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
-    df['score'] = pd.to_numeric(df['score'], errors='coerce')
     score_counts = df['score'].value_counts().sort_index()
     
     analysis = "📊 Review Score Distribution\n"
@@ -94,57 +187,57 @@ def get_score_distribution():
     
     return analysis
 
-def get_sentiment_analysis():
+def get_sentiment_analysis(filter=None):
     """Get sentiment analysis"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
-    
-    positive_words = ['love', 'great', 'excellent', 'amazing', 'perfect', 'good', 'best', 'awesome', 'wonderful', 'fantastic']
-    negative_words = ['hate', 'bad', 'terrible', 'awful', 'worst', 'poor', 'horrible', 'useless', 'broken', 'garbage']
-    
-    df['content_lower'] = df['content'].fillna('').str.lower()
-    
-    df['sentiment'] = df['content_lower'].apply(lambda x: 
-        'positive' if any(w in x for w in positive_words) and not any(w in x for w in negative_words)
-        else 'negative' if any(w in x for w in negative_words) and not any(w in x for w in positive_words)
-        else 'neutral'
-    )
+    if df.empty:
+        return "No reviews match the filter"
     
     sentiment_counts = df['sentiment'].value_counts()
     
     analysis = "💬 Sentiment Analysis\n"
     analysis += "=" * 50 + "\n"
     for sentiment, count in sentiment_counts.items():
+        if not count:
+            continue
         percentage = (count / len(df)) * 100
         analysis += f"{sentiment.upper()}: {count:,} ({percentage:.1f}%)\n"
     
     return analysis
 
-def get_top_reviewers():
+def get_top_reviewers(limit=config.TOP_K_RESULTS, filter=None):
     """Get top reviewers"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
-    top_users = df['userName'].value_counts().head(10)
+    top_users = df['userName'].value_counts().head(limit)
     
-    analysis = "👥 Top 10 Most Active Reviewers\n"
+    analysis = f"👥 Top {limit} Most Active Reviewers\n"
     analysis += "=" * 50 + "\n"
     for i, (user, count) in enumerate(top_users.items(), 1):
         analysis += f"{i}. {user}: {count:,} reviews\n"
     
     return analysis
 
-def get_version_analysis():
+def get_version_analysis(level="build", limit=config.TOP_K_RESULTS, filter=None):
     """Get version analysis"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
-    top_versions = df['appVersion'].value_counts().head(10)
+    versions, reviews, rated, score_sum = version_totals(df)
+    rollup = versions.rollup(level, reviews, rated, score_sum, config.RATING_PRIOR_WEIGHT)
+    top_versions = pd.Series(rollup['reviews'], index=rollup['labels']).sort_values(ascending=False, kind='stable')
+    top_versions = top_versions[top_versions > 0].head(limit)
     
-    analysis = "📱 Top App Versions\n"
+    analysis = f"📱 Top App Versions ({level})\n"
     analysis += "=" * 50 + "\n"
     for version, count in top_versions.items():
         percentage = (count / len(df)) * 100
@@ -152,13 +245,13 @@ def get_version_analysis():
     
     return analysis
 
-def get_thumbs_up_analysis():
+def get_thumbs_up_analysis(filter=None):
     """Get thumbs up analysis"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
-    
-    df['thumbsUpCount'] = pd.to_numeric(df['thumbsUpCount'], errors='coerce')
+    if df.empty:
+        return "No reviews match the filter"
     
     total_thumbs = df['thumbsUpCount'].sum()
     avg_thumbs = df['thumbsUpCount'].mean()
@@ -174,14 +267,13 @@ def get_thumbs_up_analysis():
     
     return analysis
 
-def get_content_length_analysis():
+def get_content_length_analysis(filter=None):
     """Get content length analysis"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
-    
-    df['content_length'] = df['content'].fillna('').str.len()
-    df['word_count'] = df['content'].fillna('').str.split().str.len()
+    if df.empty:
+        return "No reviews match the filter"
     
     analysis = "📝 Review Content Analysis\n"
     analysis += "=" * 50 + "\n"
@@ -193,17 +285,19 @@ def get_content_length_analysis():
     
     return analysis
 
-def get_common_topics():
+def get_common_topics(filter=None):
     """Get common topics"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
     stopwords = {'the', 'a', 'an', 'and', 'or', 'but', 'is', 'it', 'to', 'of', 'in', 'for', 'on', 'with'}
     
     all_words = []
-    for content in df['content'].fillna(''):
-        words = content.lower().split()
+    for content in df['content_lower']:
+        words = content.split()
         all_words.extend([w for w in words if len(w) > 3 and w not in stopwords])
     
     from collections import Counter
@@ -216,30 +310,40 @@ def get_common_topics():
     
     return analysis
 
-def get_rating_by_version():
-    """Get rating by version"""
-    df = load_netflix_csv()
+def get_rating_by_version(level="build", order="rating", limit=config.TOP_K_RESULTS, filter=None):
+    """Get rating by version, ranked by the Bayesian average of rating_by_version"""
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
-    
-    df['score'] = pd.to_numeric(df['score'], errors='coerce')
-    
-    version_ratings = df.groupby('appVersion')['score'].agg(['mean', 'count']).sort_values('mean', ascending=False).head(10)
-    
-    analysis = "⭐ Rating by App Version\n"
+    if df.empty:
+        return "No reviews match the filter"
+    
+    versions, reviews, rated, score_sum = version_totals(df)
+    rollup = versions.rollup(level, reviews, rated, score_sum, config.RATING_PRIOR_WEIGHT)
+    version_ratings = pd.DataFrame({'weighted': rollup['weighted'], 'mean': rollup['average'], 'count': rollup['rated']},
+                                   index=rollup['labels'])
+    version_ratings = version_ratings[version_ratings['count'] > 0]
+    if order == "rating":
+        version_ratings = version_ratings.sort_values('weighted', ascending=False, kind='stable')
+    else:
+        version_ratings = version_ratings[::-1]
+    version_ratings = version_ratings.head(limit)
+    
+    analysis = f"⭐ Rating by App Version ({level})\n"
     analysis += "=" * 50 + "\n"
     for version, row in version_ratings.iterrows():
-        analysis += f"v{version}: {row['mean']:.2f} avg ({row['count']:.0f} reviews)\n"
+        analysis += f"v{version}: {row['weighted']:.2f} weighted ({row['mean']:.2f} avg, {row['count']:.0f} ratings)\n"
     
     return analysis
 
-def get_review_trends():
+def get_review_trends(filter=None):
     """Get review trends"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
-    df['date'] = pd.to_datetime(df['at'], errors='coerce').dt.date
     daily_reviews = df.groupby('date').size().sort_index().tail(10)
     
     analysis = "📅 Review Trends (Last 10 Days)\n"
@@ -249,23 +353,22 @@ def get_review_trends():
     
     return analysis
 
-def get_user_engagement_score():
+def get_user_engagement_score(limit=config.TOP_K_RESULTS, filter=None):
     """Get user engagement score"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
-    df['score'] = pd.to_numeric(df['score'], errors='coerce')
-    df['thumbsUpCount'] = pd.to_numeric(df['thumbsUpCount'], errors='coerce')
-    
-    user_stats = df.groupby('userName').agg({
+    user_stats = df.groupby('userName', observed=True).agg({
         'reviewId': 'count',
         'thumbsUpCount': 'sum',
         'score': 'mean'
     }).rename(columns={'reviewId': 'reviews'})
     
     user_stats['engagement'] = (user_stats['reviews'] * 0.4) + (user_stats['thumbsUpCount'] * 0.3) + (user_stats['score'] * 0.3)
-    top_users = user_stats.nlargest(10, 'engagement')
+    top_users = user_stats.nlargest(limit, 'engagement')
     
     analysis = "🎯 Top Engaged Users\n"
     analysis += "=" * 50 + "\n"
@@ -274,32 +377,39 @@ def get_user_engagement_score():
     
     return analysis
 
-def get_review_completeness():
+def get_review_completeness(filter=None):
     """Get review completeness"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
     analysis = "✓ Data Completeness\n"
     analysis += "=" * 50 + "\n"
     
-    for col in df.columns:
-        non_null = df[col].notna().sum()
+    # Non-blank raw values of the source columns, as the server counts them
+    for bit, col in enumerate(COLUMNS):
+        non_null = int(((df['present'].to_numpy() >> bit) & 1).sum())
         percentage = (non_null / len(df)) * 100
         analysis += f"{col}: {non_null:,}/{len(df):,} ({percentage:.1f}%)\n"
     
+    analysis += f"\nMalformed Timestamps (at): {int(df['at_malformed'].sum()):,}\n"
+    
     return analysis
 
-def get_keyword_sentiment(keyword):
+def get_keyword_sentiment(keyword, filter=None):
     """Get keyword sentiment analysis"""
-    df = load_netflix_csv()
+    df = filtered_reviews(filter)
     if df is None:
         return "Unable to load data"
+    if df.empty:
+        return "No reviews match the filter"
     
     if not keyword:
         keyword = "netflix"
     
-    mask = df['content'].fillna('').str.lower().str.contains(keyword.lower())
+    mask = df['content_lower'].str.contains(keyword.lower())
     matching = df[mask]
     
     if len(matching) == 0:
@@ -309,11 +419,9 @@ def get_keyword_sentiment(keyword):
     analysis += "=" * 50 + "\n"
     analysis += f"Total Mentions: {len(matching):,}\n"
     
-    positive_words = ['love', 'great', 'excellent', 'amazing', 'perfect', 'good', 'best']
-    negative_words = ['hate', 'bad', 'terrible', 'awful', 'worst', 'poor', 'horrible']
-    
-    positive = matching['content'].fillna('').str.lower().apply(lambda x: any(w in x for w in positive_words)).sum()
-    negative = matching['content'].fillna('').str.lower().apply(lambda x: any(w in x for w in negative_words)).sum()
+    flags = matching['sentiment_flags']
+    positive = int(((flags & POSITIVE) != 0).sum())
+    negative = int(((flags & NEGATIVE) != 0).sum())
     
     analysis += f"Positive: {positive} ({positive/len(matching)*100:.1f}%)\n"
     analysis += f"Negative: {negative} ({negative/len(matching)*100:.1f}%)\n"
@@ -350,6 +458,72 @@ def provide_general_response(user_input):
     
     return response
 
+# ============= MCP CLIENT =============
+
+# Offline fallback: local pandas implementation of each server tool
+LOCAL_ANALYSES = {
+    "review_score_distribution": get_score_distribution,
+    "sentiment_analysis": get_sentiment_analysis,
+    "top_reviewers": get_top_reviewers,
+    "version_analysis": get_version_analysis,
+    "thumbs_up_analysis": get_thumbs_up_analysis,
+    "content_length_analysis": get_content_length_analysis,
+    "common_topics": get_common_topics,
+    "rating_by_version": get_rating_by_version,
+    "review_trends": get_review_trends,
+    "user_engagement_score": get_user_engagement_score,
+    "review_completeness": get_review_completeness,
+    "keyword_sentiment_analysis": get_keyword_sentiment,
+}
+
+def default_mcp_target() -> str:
+    """Sidebar MCP Host matching how config.MCP_TRANSPORT runs the server"""
+    if config.MCP_TRANSPORT == "stdio":
+        return "stdio"
+    path = "/sse" if config.MCP_TRANSPORT == "sse" else "/mcp"
+    return f"http://{config.MCP_HOST}:{config.MCP_PORT}{path}"
+
+def get_mcp_connection(target: str, timeout: float) -> MCPConnection:
+    """MCP session shared by every Streamlit session of this process"""
+    return get_connection(target, timeout)
+
+def current_filter() -> dict:
+    """Filter set in the sidebar, with only the conditions that are in use"""
+    state = st.session_state
+    filter = {}
+    dates = state.get("filter_dates") or ()
+    if len(dates) > 0:
+        filter["start_date"] = dates[0].isoformat()
+    if len(dates) > 1:
+        filter["end_date"] = dates[1].isoformat()
+    if state.get("filter_scores"):
+        filter["scores"] = list(state.filter_scores)
+    if state.get("filter_version", "").strip():
+        filter["version_prefix"] = state.filter_version.strip()
+    if state.get("filter_version_since", "").strip():
+        filter["version_since"] = state.filter_version_since.strip()
+    if state.get("filter_version_until", "").strip():
+        filter["version_until"] = state.filter_version_until.strip()
+    if state.get("filter_min_thumbs"):
+        filter["min_thumbs"] = int(state.filter_min_thumbs)
+    if state.get("filter_keyword", "").strip():
+        filter["keyword"] = state.filter_keyword.strip()
+    return filter
+
+def run_analysis(tool: str, arguments: dict) -> str:
+    """Run an analysis on the MCP server, or locally in offline mode"""
+    if st.session_state.get("offline_mode"):
+        return LOCAL_ANALYSES[tool](**arguments)
+    
+    connection = get_mcp_connection(st.session_state.mcp_host.strip(), st.session_state.timeout)
+    try:
+        result = connection.call_tool(tool, arguments)
+    except Exception as e:
+        st.session_state.mcp_connected = False
+        return f"MCP server {connection.target} unavailable: {e}\nEnable offline mode in the sidebar to analyze the CSV locally."
+    st.session_state.mcp_connected = True
+    return result
+
 # ============= SESSION STATE INITIALIZATION =============
 
 if "chat_history" not in st.session_state:
@@ -372,14 +546,32 @@ with col2:
 
 with col3:
     status = st.empty()
+    if st.session_state.get("offline_mode"):
+        status.caption("📴 Offline mode")
+    elif st.session_state.mcp_connected:
+        status.caption("🟢 MCP connected")
 
 # ============= SIDEBAR =============
 with st.sidebar:
     st.header("⚙️ Configuration")
     
     st.subheader("MCP Server Settings")
-    mcp_host = st.text_input("MCP Host", value="http://localhost:8000", key="mcp_host")
+    mcp_host = st.text_input("MCP Host", value=default_mcp_target(), key="mcp_host",
+                             help="URL of a server running the HTTP transport, or 'stdio' to start main.py")
     mcp_timeout = st.slider("Timeout (seconds)", 5, 60, 30, key="timeout")
+    offline_mode = st.checkbox("Offline mode (analyze the CSV locally)", value=False, key="offline_mode")
+    
+    st.divider()
+    
+    st.subheader("🔎 Filter")
+    st.date_input("Review dates", value=(), key="filter_dates")
+    st.multiselect("Scores", [1, 2, 3, 4, 5], key="filter_scores")
+    st.text_input("App version prefix", placeholder="e.g. 8.", key="filter_version")
+    st.text_input("App versions since", placeholder="e.g. 8.100", key="filter_version_since")
+    st.text_input("App versions until", placeholder="e.g. 8 (inclusive)", key="filter_version_until")
+    st.number_input("Minimum thumbs up", min_value=0, value=0, key="filter_min_thumbs")
+    st.text_input("Content keyword", key="filter_keyword")
+    st.caption("Analyses cover only the reviews matching every condition set here")
     
     st.divider()
     
@@ -405,13 +597,7 @@ with st.sidebar:
     st.divider()
     
     st.subheader("📚 Available Resources")
-    resources = [
-        "netflix://data/overview",
-        "netflix://data/structure",
-        "netflix://analysis/summary"
-    ]
-    
-    for resource in resources:
+    for resource in config.RESOURCES:
         st.caption(f"📄 {resource}")
     
     st.divider()
@@ -422,6 +608,7 @@ with st.sidebar:
         st.rerun()
     
     if st.button("🔄 Refresh MCP Connection", use_container_width=True):
+        close_connection(mcp_host.strip())
         st.session_state.mcp_connected = False
         st.rerun()
 
@@ -528,31 +715,13 @@ if submit_button and user_input:
                     break
             
             if matched_tool:
-                if matched_tool == "review_score_distribution":
-                    response_text = get_score_distribution()
-                elif matched_tool == "sentiment_analysis":
-                    response_text = get_sentiment_analysis()
-                elif matched_tool == "top_reviewers":
-                    response_text = get_top_reviewers()
-                elif matched_tool == "version_analysis":
-                    response_text = get_version_analysis()
-                elif matched_tool == "thumbs_up_analysis":
-                    response_text = get_thumbs_up_analysis()
-                elif matched_tool == "content_length_analysis":
-                    response_text = get_content_length_analysis()
-                elif matched_tool == "common_topics":
-                    response_text = get_common_topics()
-                elif matched_tool == "rating_by_version":
-                    response_text = get_rating_by_version()
-                elif matched_tool == "review_trends":
-                    response_text = get_review_trends()
-                elif matched_tool == "user_engagement_score":
-                    response_text = get_user_engagement_score()
-                elif matched_tool == "review_completeness":
-                    response_text = get_review_completeness()
-                elif matched_tool == "keyword_sentiment_analysis":
-                    keyword_extract = extract_keyword(input_lower)
-                    response_text = get_keyword_sentiment(keyword_extract)
+                arguments = {}
+                if matched_tool == "keyword_sentiment_analysis":
+                    arguments["keyword"] = extract_keyword(input_lower)
+                filter = current_filter()
+                if filter:
+                    arguments["filter"] = filter
+                response_text = run_analysis(matched_tool, arguments)
             else:
                 response_text = provide_general_response(user_input)
             
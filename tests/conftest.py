@@ -0,0 +1,72 @@
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Importing main must not load the project's CSV or write its snapshot
+_DATA_DIR = Path(tempfile.mkdtemp(prefix="netflix-tests-"))
+os.environ["DATA_FILE"] = str(_DATA_DIR / "netflix_data.csv")
+os.environ["CACHE_FILE"] = str(_DATA_DIR / "netflix_cache")
+os.environ["INGEST_DIR"] = str(_DATA_DIR / "ingest")
+
+from dataset import Dataset  # noqa: E402
+from review_store import COLUMNS, ReviewStore, source_fingerprint  # noqa: E402
+
+
+def review(i: int, **values) -> dict:
+    """Raw CSV row of review ``i`` with plain defaults, overridden by ``values``"""
+    row = {
+        'reviewId': f"r{i}",
+        'userName': f"user{i}",
+        'content': f"review {i}",
+        'score': 3,
+        'thumbsUpCount': 0,
+        'reviewCreatedVersion': "8.5.0",
+        'at': "2023-06-01 12:00:00",
+        'appVersion': "8.5.0 build 1 1",
+    }
+    row.update(values)
+    return row
+
+
+def write_reviews(path: Path, rows: list) -> Path:
+    """Write ``rows`` (dicts keyed by COLUMNS) as a reviews CSV"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def call(tool, **kwargs):
+    """Run an MCP tool synchronously, the way the server would, offloaded or not"""
+    if asyncio.iscoroutinefunction(tool):
+        return tool.__wrapped__(**kwargs)
+    return tool(**kwargs)
+
+
+def text_of(result) -> str:
+    """Text of a tool result in either format"""
+    return result.text if hasattr(result, 'text') else result.content[0].text
+
+
+@pytest.fixture
+def serve(tmp_path):
+    """Function making a list of rows the dataset main's tools serve, with an empty result cache"""
+    import main
+
+    def serve(rows: list) -> Dataset:
+        path = write_reviews(tmp_path / "served.csv", rows)
+        dataset = Dataset(ReviewStore.from_csv(path), source_fingerprint(path))
+        main.DATASET.swap(dataset)
+        main.RESULTS.clear()
+        return dataset
+
+    return serve
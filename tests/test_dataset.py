@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import os
+
+from dataset import Dataset, DatasetManager
+from result_cache import ResultCache
+from review_store import COLUMNS, ReviewStore, source_fingerprint
+
+
+def test_version_covers_whole_fingerprint():
+    store = ReviewStore.empty()
+    source = {'size': 100, 'mtime_ns': 1, 'sample_hash': 'ab' * 16}
+    edited = dict(source, mtime_ns=2)
+    # Same sampled hash (an edit in the middle of a large file), new mtime
+    assert Dataset(store, source).version != Dataset(store, edited).version
+    assert Dataset(store, source).version == Dataset(store, dict(source)).version
+    assert Dataset(store, None).version == "unknown"
+
+
+def test_cached_results_are_dropped_after_reload_of_same_size_edit(tmp_path):
+    path = tmp_path / "reviews.csv"
+    rows = [",".join(COLUMNS)]
+    rows += [f"r{i},user{i},review {i},5,1,8.5.0,2023-06-01 12:00:00,8.5.0" for i in range(9)]
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+    def load():
+        return Dataset(ReviewStore.from_csv(path), source_fingerprint(path))
+
+    manager = DatasetManager(load(), load, path)
+    results = ResultCache(max_entries=10, max_bytes=10_000, ttl_seconds=3600)
+    five_stars = results.memoize(lambda: int(manager.current().aggregates.score_counts[5]), manager.identity)
+    assert five_stars() == 9
+
+    # Same size, same mtime: an edit in the middle the fingerprint cannot see
+    stat = os.stat(path)
+    path.write_text(path.read_text(encoding="utf-8").replace("review 4,5,", "review 4,1,"), encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert os.stat(path).st_size == stat.st_size
+
+    manager.reload()
+    assert manager.current().aggregates.score_counts[5] == 8
+    assert five_stars() == 8
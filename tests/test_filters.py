@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from conftest import review, write_reviews
+from dataset import Dataset
+from review_store import ReviewStore, source_fingerprint
+from versions import parse_version
+
+TIMES = ["2023-05-01 08:00:00", "2023-05-15 00:00:00", "2023-05-31 23:59:59", "2023-06-01 00:00:00",
+         "2023-06-30 12:30:00", "2024-01-01 00:00:00", "", "not a time"]
+VERSIONS = ["8.99.0 build 1 1", "8.100.0 build 2 2", "8.120.3 build 5 5", "8.120.3 build 6 9",
+            "9.0.0 build 1 1", "10.1.0 build 1 1", "", "beta"]
+CONTENT = ["Crash on start", "love it", "keeps crashing!", "", "Love it, no crash", "meh"]
+SCORES = ["1", "2", "3", "4", "5", "", "7"]
+THUMBS = ["0", "1", "3", "12", "", "x"]
+
+
+@pytest.fixture(scope='module')
+def reviews(tmp_path_factory):
+    rows = [review(i, at=TIMES[i % 8], appVersion=VERSIONS[i * 3 % 8], content=CONTENT[i % 6],
+                   score=SCORES[i % 7], thumbsUpCount=THUMBS[i * 5 % 6])
+            for i in range(120)]
+    path = write_reviews(tmp_path_factory.mktemp("filters") / "reviews.csv", rows)
+    return Dataset(ReviewStore.from_csv(path), source_fingerprint(path)), pd.DataFrame(rows).astype(str)
+
+
+def brute_force(frame: pd.DataFrame, filter: dict) -> np.ndarray:
+    """Ids of the rows matching ``filter``, one pandas mask per condition"""
+    at = pd.to_datetime(frame['at'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    score = pd.to_numeric(frame['score'], errors='coerce')
+    score = score.where(score.isin(config.VALID_SCORES))  # out of range counts as missing
+    thumbs = pd.to_numeric(frame['thumbsUpCount'], errors='coerce')
+    keys = frame['appVersion'].map(parse_version)
+    mask = pd.Series(True, index=frame.index)
+    if 'start_date' in filter:
+        mask &= at >= pd.Timestamp(filter['start_date'])
+    if 'end_date' in filter:
+        end = pd.Period(filter['end_date'], freq={4: 'Y', 7: 'M', 10: 'D'}.get(len(filter['end_date']), 's'))
+        mask &= at <= end.end_time
+    if 'scores' in filter:
+        mask &= score.isin(filter['scores'])
+    if 'min_thumbs' in filter:
+        mask &= thumbs >= filter['min_thumbs']
+    if 'keyword' in filter:
+        mask &= frame['content'].str.lower().str.contains(filter['keyword'].lower(), regex=False)
+    if 'version_prefix' in filter:
+        mask &= frame['appVersion'].str.startswith(filter['version_prefix'])
+    if 'version_since' in filter:
+        since = parse_version(filter['version_since'])
+        mask &= keys.map(lambda key: key is not None and key >= since)
+    if 'version_until' in filter:
+        # Inclusive at its own precision: compare only as many components as given
+        until = parse_version(filter['version_until'])
+        mask &= keys.map(lambda key: key is not None and key[:len(until)] <= until)
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize('filter', [
+    {'start_date': "2023-05-15"},
+    {'end_date': "2023-05-31"},
+    {'end_date': "2023-05"},
+    {'end_date': "2023"},
+    {'start_date': "2023-05-31T23:59:59", 'end_date': "2023-06-01"},
+    {'scores': [1, 5]},
+    {'scores': [7]},
+    {'min_thumbs': 0},
+    {'min_thumbs': 3},
+    {'keyword': "crash"},
+    {'keyword': "love it"},
+    {'version_prefix': "8.1"},
+    {'version_since': "8.100"},
+    {'version_until': "8"},
+    {'version_since': "8.100", 'version_until': "8.120"},
+    {'keyword': "crash", 'version_since': "8.100", 'version_until': "9"},
+    {'keyword': "love", 'scores': [4, 5], 'min_thumbs': 1, 'end_date': "2023-06"},
+    {'version_prefix': "8.", 'version_since': "8.120", 'start_date': "2023-05-15", 'end_date': "2023-06-01"},
+])
+def test_select_matches_brute_force(reviews, filter):
+    dataset, frame = reviews
+    rows = dataset.filters.select(filter, dataset.index)
+    assert rows.tolist() == brute_force(frame, filter).tolist()
+    assert dataset.filtered(filter).store.review_id.tolist() == frame['reviewId'].iloc[rows].tolist()
+
+
+def test_filter_without_conditions_is_the_dataset(reviews):
+    dataset, _ = reviews
+    assert dataset.filters.select({}, dataset.index) is None
+    assert dataset.filtered(None) is dataset
+    with pytest.raises(ValueError, match="Unknown filter keys: stars"):
+        dataset.filtered({'stars': [5]})
+
+
+def test_filtered_views_are_reused_least_recently_used_first(reviews, monkeypatch):
+    dataset, _ = reviews
+    monkeypatch.setattr(config, 'FILTER_VIEW_CACHE_SIZE', 2)
+    dataset._views.clear()
+    first = dataset.filtered({'scores': [1], 'min_thumbs': 1})
+    second = dataset.filtered({'scores': [2]})
+
+    # Key order does not matter, and a hit makes the view the most recently used
+    assert dataset.filtered({'min_thumbs': 1, 'scores': [1]}) is first
+    dataset.filtered({'scores': [3]})
+    assert dataset.filtered({'scores': [1], 'min_thumbs': 1}) is first
+    assert dataset.filtered({'scores': [2]}) is not second
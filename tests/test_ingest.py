@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import ingest
+from conftest import call, review, text_of, write_reviews
+from dataset import Dataset
+from ingest import ReviewIngestor
+from review_store import (NUMERIC_COLUMNS, SNAPSHOT_META, STRING_COLUMNS, ReviewStore, _append_npy,
+                          source_fingerprint)
+
+import main
+
+
+def load(path):
+    return Dataset(ReviewStore.from_csv(path), source_fingerprint(path))
+
+
+def numeric(store, name):
+    values = np.asarray(getattr(store, name))
+    # NaT never equals itself; compare the raw seconds
+    return values.view(np.int64) if name == 'at' else values
+
+
+def assert_same_store(store, expected):
+    assert len(store) == len(expected)
+    for name in NUMERIC_COLUMNS:
+        if name.endswith('_codes'):
+            continue
+        assert np.array_equal(numeric(store, name), numeric(expected, name)), name
+    for name in STRING_COLUMNS:
+        if name.endswith('_names'):
+            continue
+        assert list(getattr(store, name)) == list(getattr(expected, name)), name
+    # Category codes may differ; the values they stand for may not
+    for codes, names in ingest.CATEGORIES:
+        assert ([getattr(store, names)[c] for c in getattr(store, codes)] ==
+                [getattr(expected, names)[c] for c in getattr(expected, codes)]), names
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    data_file = write_reviews(tmp_path / "reviews.csv", [review(i) for i in range(3)])
+    return data_file, tmp_path / "cache", load(data_file)
+
+
+def test_ingest_skips_loaded_and_repeated_review_ids(tmp_path, loaded):
+    data_file, cache_dir, dataset = loaded
+    batch = write_reviews(tmp_path / "batch.csv", [
+        review(1, content="loaded already"),
+        review(3, userName="newcomer", appVersion="8.6.0 build 2 2"),
+        review(3, content="repeated in the batch"),
+        review(4, score=5),
+    ])
+    ingestor = ReviewIngestor(data_file, cache_dir)
+
+    ingested, added, skipped = ingestor.ingest(dataset, batch)
+    assert (added, skipped) == (2, 2)
+    assert ingested.store.review_id.tolist() == ["r0", "r1", "r2", "r3", "r4"]
+    assert ingested.store.content[3] == "review 3"
+
+    # CSV, appended snapshot and in-memory dataset all hold the same rows
+    full = ReviewStore.from_csv(data_file)
+    assert_same_store(full, ingested.store)
+    assert_same_store(ReviewStore.open(cache_dir, source_fingerprint(data_file)), full)
+    assert ingested.aggregates.score_counts.tolist() == load(data_file).aggregates.score_counts.tolist()
+
+    again, added, skipped = ingestor.ingest(ingested, batch)
+    assert (again, added, skipped) == (ingested, 0, 4)
+
+
+def test_append_npy_rewrites_header_in_place(tmp_path):
+    path = tmp_path / "column.npy"
+    np.save(path, np.arange(9, dtype=np.int32))
+    size = path.stat().st_size
+
+    # The shape gains digits without moving the data
+    assert _append_npy(path, np.arange(9, 100_000)) == 100_000
+    assert path.stat().st_size == size + (100_000 - 9) * 4
+    assert np.array_equal(np.load(path), np.arange(100_000, dtype=np.int32))
+
+    # Bytes past the shape, left by an interrupted append, are overwritten
+    with open(path, 'ab') as f:
+        f.write(b"\xff" * 6)
+    assert _append_npy(path, np.array([-1])) == 100_001
+    loaded = np.load(path, mmap_mode='r')
+    assert loaded.dtype == np.int32 and loaded[-1] == -1 and loaded[-2] == 99_999
+
+
+def test_failed_append_leaves_csv_and_dataset_as_they_were(tmp_path, loaded, monkeypatch):
+    data_file, cache_dir, dataset = loaded
+    batch = write_reviews(tmp_path / "batch.csv", [review(3), review(4)])
+    original = data_file.read_bytes()
+
+    def fail_partway(directory, columns, source=None):
+        _append_npy(directory / "score.npy", columns['score'])
+        raise OSError("disk full")
+
+    ingestor = ReviewIngestor(data_file, cache_dir)
+    monkeypatch.setattr(ingest, 'append_snapshot', fail_partway)
+    with pytest.raises(OSError, match="disk full"):
+        ingestor.ingest(dataset, batch)
+    assert data_file.read_bytes() == original
+    assert not (cache_dir / SNAPSHOT_META).exists()
+
+    # A retry appends each row once and rebuilds the snapshot
+    monkeypatch.undo()
+    ingested, added, skipped = ingestor.ingest(dataset, batch)
+    assert (added, skipped) == (2, 0)
+    assert ReviewStore.from_csv(data_file).review_id.tolist() == ["r0", "r1", "r2", "r3", "r4"]
+    assert_same_store(ReviewStore.open(cache_dir, source_fingerprint(data_file)), ingested.store)
+
+
+@pytest.mark.parametrize('csv_path', ["../outside.csv", "nested/../../outside.csv", "/etc/passwd"])
+def test_ingest_reviews_refuses_paths_outside_ingest_dir(serve, csv_path):
+    dataset = serve([review(0)])
+    result = call(main.ingest_reviews, csv_path=csv_path, format="json")
+    assert "only files inside" in text_of(result)
+    assert main.DATASET.current() is dataset
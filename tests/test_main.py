@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import re
+
+import pytest
+
+import config
+from conftest import call, review, text_of
+
+import main
+
+
+@pytest.mark.parametrize('tool, field, label', [
+    (main.content_length_analysis, 'median_length', "Median Content Length"),
+    (main.review_score_distribution, 'median_score', "Median Score"),
+])
+def test_even_count_medians_agree_between_formats(serve, tool, field, label):
+    # Lengths 5, 6, 7, 8 and scores 2, 3, 4, 5: both medians fall between two values
+    serve([review(i, content="x" * length, score=score)
+           for i, (length, score) in enumerate([(5, 2), (6, 3), (7, 4), (8, 5)])])
+
+    structured = call(tool, format="json").structured_content
+    text = text_of(call(tool, format="text"))
+
+    expected = 6.5 if field == 'median_length' else 3.5
+    assert structured[field] == expected
+    assert float(re.search(rf"{label}: ([\d.]+)", text).group(1)) == expected
+
+
+BATCH = ['review_score_distribution', 'top_reviewers', 'common_topics', 'keyword_sentiment_analysis']
+BATCH_ARGUMENTS = {'keyword_sentiment_analysis': {'keyword': "crash"}}
+
+
+def batch_rows():
+    words = ["great shows", "app keeps crashing", "crash on startup again", "love the catalogue"]
+    return [review(i, userName=f"user{i % 5}", content=f"{words[i % 4]} review number {i}",
+                   score=i % 5 + 1, thumbsUpCount=i % 7) for i in range(40)]
+
+
+@pytest.mark.parametrize('filter', [None, {'scores': [1, 2, 5]}, {'version_prefix': "8."}])
+def test_run_analyses_matches_separate_calls(serve, filter):
+    serve(batch_rows())
+    combined = call(main.run_analyses, names=BATCH, filter=filter, arguments=BATCH_ARGUMENTS,
+                    format="json").structured_content['analyses']
+    texts = [text_of(result) for result in
+             call(main.run_analyses, names=BATCH, filter=filter, arguments=BATCH_ARGUMENTS, format="text")]
+
+    main.RESULTS.clear()
+    for name, text in zip(BATCH, texts):
+        tool = getattr(main, name)
+        kwargs = dict(BATCH_ARGUMENTS.get(name, {}), filter=filter)
+        assert combined[name] == call(tool, **kwargs, format="json").structured_content, name
+        assert text == text_of(call(tool, **kwargs, format="text")), name
+
+
+def test_run_analyses_counts_rows_of_nested_calls(serve):
+    serve(batch_rows())
+    main.METRICS.reset()
+    call(main.run_analyses, names=BATCH, filter={'scores': [1, 2]}, arguments=BATCH_ARGUMENTS, format="json")
+
+    stats = main.METRICS.snapshot()
+    nested = sum(stats[name]['rows_scanned'] for name in BATCH)
+    assert nested > 0
+    assert stats['run_analyses']['rows_scanned'] == nested
+
+
+def test_config_registries_list_what_the_server_serves():
+    assert [tool.name for tool in asyncio.run(main.server.list_tools())] == list(config.TOOLS)
+    assert [str(resource.uri) for resource in asyncio.run(main.server.list_resources())] == list(config.RESOURCES)
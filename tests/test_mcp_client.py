@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import mcp_client
+from mcp_client import close_connection, get_connection
+
+
+def closed(connection) -> bool:
+    connection._thread.join(timeout=5)
+    return not connection._thread.is_alive()
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    connections = {}
+    monkeypatch.setattr(mcp_client, '_connections', connections)
+    yield connections
+    for target in list(connections):
+        close_connection(target)
+
+
+def test_connections_are_shared_per_target_and_timeout(registry):
+    first = get_connection("http://a:8000/mcp", 30)
+    assert get_connection("http://a:8000/mcp", 30) is first
+    assert get_connection("stdio", 30) is not first
+
+    replaced = get_connection("http://a:8000/mcp", 10)
+    assert replaced is not first and replaced.timeout == 10
+    assert closed(first)
+    assert registry["http://a:8000/mcp"] is replaced
+
+
+def test_connections_beyond_the_limit_are_closed(registry, monkeypatch):
+    monkeypatch.setattr(mcp_client, 'MAX_CONNECTIONS', 2)
+    oldest = get_connection("http://a:8000/mcp")
+    get_connection("http://b:8000/mcp")
+    get_connection("http://c:8000/mcp")
+    assert list(registry) == ["http://b:8000/mcp", "http://c:8000/mcp"]
+    assert closed(oldest)
+
+
+def test_close_connection_never_opens_one(registry):
+    close_connection("http://nowhere:8000/mcp")
+    assert registry == {}
+
+    connection = get_connection("stdio")
+    close_connection("stdio")
+    assert closed(connection) and registry == {}
+    assert get_connection("stdio") is not connection
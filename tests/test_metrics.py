@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import math
+import re
+
+import pytest
+
+from metrics import LATENCY_BOUNDS, CallStats, Metrics
+
+
+def stats_of(latencies) -> CallStats:
+    stats = CallStats()
+    for seconds in latencies:
+        stats.add(seconds, rows=10, result_bytes=100, rss_growth=0, failed=False)
+    return stats
+
+
+def test_quantiles_of_known_latencies():
+    # 1 ms to 1 s, evenly spaced on a log scale: the q quantile is 10 ** (3q - 3)
+    latencies = [10 ** (-3 + 3 * i / 999) for i in range(1000)]
+    stats = stats_of(latencies)
+    step = 10 ** (1 / 8)  # width of a bucket
+    for q in (0.5, 0.95, 0.99):
+        assert 10 ** (3 * q - 3) / step <= stats.quantile(q) <= 10 ** (3 * q - 3) * step
+    assert stats.quantile(1.0) == pytest.approx(1.0)
+    assert stats.summary()['p50_seconds'] == stats.quantile(0.5)
+
+
+def test_quantiles_never_exceed_the_slowest_call():
+    assert CallStats().quantile(0.5) == 0.0
+    stats = stats_of([0.02] * 10)
+    bucket_start = max(bound for bound in LATENCY_BOUNDS if bound < 0.02)
+    assert bucket_start <= stats.quantile(0.5) <= 0.02
+    assert stats.quantile(0.99) == 0.02
+    # Beyond the last bound only the maximum is known
+    assert stats_of([0.01, 500.0]).quantile(0.99) == 500.0
+
+
+SAMPLE = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(name="[^"\\]*"(?:,le="[^"]*")?)\})? (\S+)')
+
+
+def test_prometheus_output_is_valid_exposition_format():
+    metrics = Metrics()
+    for seconds in (0.001, 0.002, 0.3, 2.0):
+        metrics.record("review_trends", seconds, rows=5, result_bytes=50)
+    metrics.record("csv_parse", 1.5, rows=1000, failed=True)
+
+    families = {}
+    samples = []
+    for line in metrics.prometheus().splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ")
+            assert family not in families and kind in ("histogram", "counter", "gauge")
+            families[family] = kind
+            continue
+        match = SAMPLE.fullmatch(line)
+        assert match, line
+        name, labels, value = match.groups()
+        assert float(value) >= 0 and not math.isnan(float(value))
+        histogram = re.sub(r'_(bucket|sum|count)$', '', name)
+        family = histogram if families.get(histogram) == "histogram" else name
+        assert family in families, line
+        samples.append((name, labels, float(value)))
+
+    buckets = [value for name, labels, value in samples
+               if name == "netflix_call_duration_seconds_bucket" and labels.startswith('name="review_trends"')]
+    assert len(buckets) == len(LATENCY_BOUNDS) + 1
+    assert buckets == sorted(buckets) and buckets[-1] == 4
+    values = {(name, labels): value for name, labels, value in samples}
+    assert values[("netflix_call_duration_seconds_count", 'name="review_trends"')] == 4
+    assert values[("netflix_call_duration_seconds_sum", 'name="review_trends"')] == pytest.approx(2.303)
+    assert values[("netflix_rows_scanned_total", 'name="review_trends"')] == 20
+    assert values[("netflix_call_errors_total", 'name="csv_parse"')] == 1
+    assert values[("netflix_result_bytes_total", 'name="review_trends"')] == 200
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import result_cache
+from conftest import review, write_reviews
+from dataset import Dataset, DatasetManager
+from result_cache import ResultCache
+from review_store import ReviewStore, source_fingerprint
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResultCache(max_entries=2, max_bytes=1000, ttl_seconds=60)
+    cache.put('a', "alpha")
+    cache.put('b', "beta")
+    assert cache.get('a') == (True, "alpha")
+    cache.put('c', "gamma")
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, "alpha") and cache.get('c') == (True, "gamma")
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_results():
+    cache = ResultCache(max_entries=10, max_bytes=10, ttl_seconds=60)
+    cache.put('a', "six ch")
+    cache.put('b', "6 more")
+    assert cache.get('a') == (False, None)
+    assert cache.stats()['bytes'] == 6
+
+    cache.put('big', "eleven char")
+    assert cache.get('big') == (False, None)
+    assert cache.get('b') == (True, "6 more")
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    cache = ResultCache(max_entries=10, max_bytes=1000, ttl_seconds=30)
+    cache.put('a', "alpha")
+
+    now[0] += 29.9
+    assert cache.get('a') == (True, "alpha")
+    now[0] += 0.1
+    assert cache.get('a') == (False, None)
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['expirations']) == (0, 0, 1)
+
+
+def test_swapped_dataset_starts_with_an_empty_cache(tmp_path):
+    path = write_reviews(tmp_path / "reviews.csv", [review(i) for i in range(3)])
+
+    def load():
+        return Dataset(ReviewStore.from_csv(path), source_fingerprint(path))
+
+    manager = DatasetManager(load(), load, path)
+    cache = ResultCache(max_entries=10, max_bytes=1000, ttl_seconds=60)
+    computed = []
+
+    def count(limit: int = 5):
+        computed.append(manager.current())
+        return str(min(len(manager.current().store), limit))
+
+    count = cache.memoize(count, manager.identity)
+    assert count() == count(limit=5) == "3"
+    assert len(computed) == 1
+
+    # Same file, so the same content version, but a new dataset: nothing is reused
+    manager.swap(load())
+    assert manager.current().version == computed[0].version
+    assert count() == "3"
+    assert len(computed) == 2 and computed[1] is manager.current()
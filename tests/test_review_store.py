@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from aggregates import Aggregates
+from review_store import COLUMNS, MISSING, ReviewStore
+
+
+def write_csv(path, scores):
+    rows = [",".join(COLUMNS)]
+    for i, score in enumerate(scores):
+        rows.append(f"r{i},user{i},review {i},{score},1,8.5.0,2023-06-01 12:00:00,8.5.0")
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    return path
+
+
+def test_scores_outside_valid_range_are_missing(tmp_path):
+    store = ReviewStore.from_csv(write_csv(tmp_path / "reviews.csv", [0, 7, -3, 1, 5, ""]))
+    assert store.score.tolist() == [MISSING, MISSING, MISSING, 1, 5, MISSING]
+
+    aggregates = Aggregates.build(store)
+    assert len(aggregates.score_counts) == 6
+    assert aggregates.score_counts.tolist() == [0, 1, 0, 0, 0, 1]
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from rollups import Rollup
+
+
+def test_out_of_range_scores_are_not_rated():
+    days = np.array(['2023-01-01', '2023-01-02', '2023-01-02'], dtype='datetime64[D]')
+    rollup = Rollup.build(days, np.zeros(3, dtype=np.int32), np.array([3, 7, -3], dtype=np.int8),
+                          np.ones(3, dtype=np.int32))
+    assert rollup.count.tolist() == [1, 2]
+    assert rollup.score_sum.tolist() == [3, 0]
+    assert rollup.score_hist.sum(axis=1).tolist() == [1, 0]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import streaming
+from dataset import Dataset
+from review_store import COLUMNS, ReviewStore, source_fingerprint
+
+
+def test_streamed_dataset_matches_full_build(tmp_path):
+    path = tmp_path / "reviews.csv"
+    rows = [",".join(COLUMNS)]
+    for i in range(40):
+        rows.append(f"r{i},user{i % 7},{'great app' if i % 3 else 'it crashes'} {'x' * i},{i % 5 + 1},{i % 4},"
+                    f"8.{i % 6}.0,2023-06-{i % 28 + 1:02d} 12:00:00,8.{i % 6}.0 build {i % 2} 1")
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+    source = source_fingerprint(path)
+
+    streamed = streaming.build(path, tmp_path / "snapshot", source, batch_size=6)
+    full = Dataset(ReviewStore.from_csv(path), source)
+
+    for name, expected in vars(full.aggregates).items():
+        if isinstance(expected, np.ndarray):
+            assert np.array_equal(getattr(streamed.aggregates, name), expected), name
+    assert dict(streamed.aggregates.tokens) == dict(full.aggregates.tokens)
+    assert np.array_equal(streamed.sentiment, full.sentiment)
+    assert np.array_equal(streamed.index.lookup("crash", streamed.store.content),
+                          full.index.lookup("crash", full.store.content))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import config
+from conftest import call, review
+from versions import VersionIndex, format_version, parse_version
+
+import main
+
+NAMES = ["8.100.0 build 3 300", "8.99.0 build 2 200", "beta", "8.9.1 build 1 100", "",
+         "9.0.0 build 1 1", "8.100.0 build 4 301", "8.99.0 build 2 201"]
+
+
+def names_in(index, mask):
+    return sorted(np.asarray(index.names, dtype=object)[mask].tolist())
+
+
+def test_versions_sort_numerically():
+    index = VersionIndex(NAMES)
+    assert [index.names[code] for code in index.order] == [
+        "8.9.1 build 1 100", "8.99.0 build 2 200", "8.99.0 build 2 201",
+        "8.100.0 build 3 300", "8.100.0 build 4 301", "9.0.0 build 1 1",
+    ]
+    assert parse_version("8.100") > parse_version("8.99")
+    assert format_version(parse_version(" 8.120.0 Build 10 50520 ")) == "8.120.0 build 10 50520"
+
+
+def test_unparseable_versions_are_in_no_range_or_group():
+    index = VersionIndex(NAMES)
+    assert names_in(index, ~index.parsed()) == ["", "beta"]
+    assert not (index.range() & ~index.parsed()).any()
+    for level in ("major", "minor", "build"):
+        assert index.group_ids[level][[2, 4]].tolist() == [-1, -1]
+    assert parse_version("8.x") is None and parse_version("") is None
+    with pytest.raises(ValueError, match="Invalid version"):
+        index.range(since="latest")
+
+
+@pytest.mark.parametrize('since, until, expected', [
+    ("8.99", "8.99", ["8.99.0 build 2 200", "8.99.0 build 2 201"]),
+    ("8.100", None, ["8.100.0 build 3 300", "8.100.0 build 4 301", "9.0.0 build 1 1"]),
+    (None, "8", ["8.100.0 build 3 300", "8.100.0 build 4 301", "8.9.1 build 1 100",
+                 "8.99.0 build 2 200", "8.99.0 build 2 201"]),
+    ("8.9.1 build 1 100", "8.99.0 build 2 200", ["8.9.1 build 1 100", "8.99.0 build 2 200"]),
+    ("8.100.0 build 4", "9", ["8.100.0 build 4 301", "9.0.0 build 1 1"]),
+    ("9", "8", []),
+])
+def test_range_is_inclusive_at_each_bound_precision(since, until, expected):
+    index = VersionIndex(NAMES)
+    assert names_in(index, index.range(since, until)) == sorted(expected)
+
+
+def test_rollups_sum_codes_into_groups_oldest_first():
+    index = VersionIndex(NAMES)
+    reviews = np.array([1, 2, 50, 4, 50, 8, 16, 32])
+    rated = np.array([1, 2, 50, 4, 50, 8, 16, 0])
+    score_sum = np.array([5, 8, 250, 12, 250, 8, 48, 0])
+
+    rollups = {level: index.rollup(level, reviews, rated, score_sum, prior_weight=10)
+               for level in ("major", "minor", "build")}
+    assert rollups['major']['labels'] == ["8", "9"]
+    assert rollups['major']['reviews'].tolist() == [55, 8]
+    assert rollups['minor']['labels'] == ["8.9", "8.99", "8.100", "9.0"]
+    assert rollups['minor']['reviews'].tolist() == [4, 34, 17, 8]
+    assert rollups['build']['labels'] == ["8.9.1 build 1 100", "8.99.0 build 2 200", "8.99.0 build 2 201",
+                                          "8.100.0 build 3 300", "8.100.0 build 4 301", "9.0.0 build 1 1"]
+
+    minor = rollups['minor']
+    assert minor['rated'].tolist() == [4, 2, 17, 8]
+    # The prior is the mean over every code, unparsed ones included
+    prior = 581 / 131
+    assert minor['prior'] == pytest.approx(prior)
+    assert minor['average'].tolist() == pytest.approx([3, 4, 53 / 17, 1])
+    assert minor['weighted'].tolist() == pytest.approx(
+        [(score + 10 * prior) / (count + 10) for score, count in [(12, 4), (8, 2), (53, 17), (8, 8)]])
+
+    unrated = index.rollup('major', reviews, np.zeros(8), np.zeros(8), prior_weight=10)
+    assert np.isnan(unrated['average']).all()
+    with pytest.raises(ValueError, match="level must be one of major, minor, build"):
+        index.rollup('patch', reviews, rated, score_sum, prior_weight=10)
+
+
+def test_rating_by_version_ranks_by_bayesian_average(serve):
+    # Two perfect ratings must not outrank two hundred good ones
+    rows = [("8.100.0 build 1 1", 5)] * 2 + [("8.9.0 build 1 1", 4)] * 200 + [("8.10.0 build 1 1", 1)] * 100
+    rows += [("beta", 5), ("", 5)]
+    serve([review(i, appVersion=version, score=score) for i, (version, score) in enumerate(rows)])
+
+    ranked = call(main.rating_by_version, level="minor", format="json").structured_content
+    prior = (2 * 5 + 200 * 4 + 100 * 1 + 2 * 5) / 304
+    assert ranked['prior_rating'] == pytest.approx(prior)
+    assert ranked['total_versions'] == 3
+    assert [v['version'] for v in ranked['versions']] == ["8.9", "8.100", "8.10"]
+    assert [v['average_rating'] for v in ranked['versions']] == [4, 5, 1]
+    weight = config.RATING_PRIOR_WEIGHT
+    assert ranked['versions'][1]['weighted_rating'] == pytest.approx((10 + weight * prior) / (2 + weight))
+
+    newest = call(main.rating_by_version, level="minor", order="version", format="json").structured_content
+    assert [v['version'] for v in newest['versions']] == ["8.100", "8.10", "8.9"]
+
+    since = call(main.rating_by_version, level="minor", filter={'version_since': "8.10"},
+                 format="json").structured_content
+    assert [v['version'] for v in since['versions']] == ["8.100", "8.10"]
+    assert since['filtered_reviews'] == 102
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Inverted index over review content for keyword queries.
+
+Tokens are maximal runs of ``[a-z]`` in the lowercased text, so every
+substring occurrence of an all-letter keyword lies inside one token: a
+substring query is answered by scanning the (small) vocabulary for tokens that
+contain the keyword and merging their posting lists, with the same results
+as ``keyword in content.lower()``.
+
+The index is a list of segments covering consecutive row ranges, so appended
+reviews are indexed on their own and merged lazily.
+"""
+
+import re
+from array import array
+
+import numpy as np
+
+from review_store import ReviewStore
+
+TOKEN_PATTERN = re.compile(r'[a-z]+')
+
+# Segments are compacted into one once an index has more than this many
+MAX_SEGMENTS = 8
+
+
+class _Segment:
+    """CSR posting lists for rows ``start:stop``; posting rows are global row ids"""
+
+    def __init__(self, start: int, stop: int, vocab: dict, indptr: np.ndarray, rows: np.ndarray):
+        self.start = start
+        self.stop = stop
+        self.vocab = vocab
+        self.indptr = indptr
+        self.rows = rows
+
+    @classmethod
+    def from_pairs(cls, start: int, stop: int, vocab: dict, token_ids: np.ndarray, row_ids: np.ndarray) -> "_Segment":
+        # Stable sort keeps each posting list in row order
+        order = np.argsort(token_ids, kind='stable')
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(token_ids, minlength=len(vocab)), out=indptr[1:])
+        return cls(start, stop, vocab, indptr, row_ids[order])
+
+    def postings(self, token_id: int) -> np.ndarray:
+        return self.rows[self.indptr[token_id]:self.indptr[token_id + 1]]
+
+    def matching(self, parts: list, whole_word: bool = False) -> np.ndarray:
+        """Sorted rows with a token equal to (or, by default, containing) any of ``parts``"""
+        if whole_word:
+            token_ids = [self.vocab[part] for part in parts if part in self.vocab]
+        else:
+            token_ids = [tid for token, tid in self.vocab.items() if any(part in token for part in parts)]
+        return self._rows(token_ids)
+
+    def searching(self, pattern: re.Pattern) -> np.ndarray:
+        """Sorted rows with a token in which ``pattern`` matches"""
+        return self._rows([tid for token, tid in self.vocab.items() if pattern.search(token)])
+
+    def _rows(self, token_ids: list) -> np.ndarray:
+        if not token_ids:
+            return np.empty(0, dtype=self.rows.dtype)
+        return np.unique(np.concatenate([self.postings(tid) for tid in token_ids]))
+
+
+class InvertedIndex:
+    """Token → row-id posting lists"""
+
+    def __init__(self, segments: list):
+        self.segments = segments
+
+    @classmethod
+    def build(cls, store: ReviewStore, start: int = 0) -> "InvertedIndex":
+        """Index ``store``, whose first row has global id ``start``"""
+        builder = IndexBuilder(start)
+        builder.add(store)
+        return builder.index()
+
+    def appended(self, other: "InvertedIndex") -> "InvertedIndex":
+        """Index of this index's rows followed by ``other``'s"""
+        index = InvertedIndex(self.segments + other.segments)
+        return index.compacted() if len(index.segments) > MAX_SEGMENTS else index
+
+    def compacted(self) -> "InvertedIndex":
+        """Merge all segments into one"""
+        vocab = {}
+        token_ids = []
+        row_ids = []
+        for segment in self.segments:
+            remap = np.array([vocab.setdefault(token, len(vocab)) for token in segment.vocab], dtype=np.int32)
+            counts = np.diff(segment.indptr)
+            token_ids.append(np.repeat(remap, counts))
+            row_ids.append(segment.rows)
+        segment = _Segment.from_pairs(self.segments[0].start, self.segments[-1].stop, vocab,
+                                      np.concatenate(token_ids), np.concatenate(row_ids))
+        return InvertedIndex([segment])
+
+    def lookup(self, keyword: str, content, whole_word: bool = False) -> np.ndarray:
+        """Sorted ids of the rows whose content contains ``keyword`` (case-insensitive)
+
+        By default this matches ``keyword.lower() in text.lower()`` exactly. With
+        ``whole_word`` every letter run of the keyword must be a whole token.
+        ``content`` is only read to verify candidates of keywords that are not a
+        single run of letters.
+        """
+        keyword = keyword.lower()
+        parts = sorted(set(TOKEN_PATTERN.findall(keyword)))
+        if not parts:
+            # Nothing to look up (e.g. digits only): scan
+            return np.array([row for row, text in enumerate(content) if keyword in text.lower()], dtype=np.int64)
+
+        candidates = None
+        for part in parts:
+            rows = np.concatenate([segment.matching([part], whole_word) for segment in self.segments])
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows)
+        if whole_word or parts == [keyword]:
+            return candidates
+        return np.array([row for row in candidates if keyword in content[row].lower()], dtype=np.int64)
+
+    def rows_matching(self, pattern: re.Pattern) -> np.ndarray:
+        """Sorted ids of the rows with a token in which ``pattern`` matches"""
+        return np.concatenate([segment.searching(pattern) for segment in self.segments])
+
+
+class IndexBuilder:
+    """Indexes consecutive stores into one segment
+
+    Batches share one vocabulary and their (token, row) pairs go into two
+    flat int32 arrays, so indexing a CSV batch by batch holds no per-batch
+    vocabularies or segments that would have to be compacted later. The
+    arrays stay in memory and grow with the number of postings.
+    """
+
+    def __init__(self, start: int = 0):
+        self.start = start
+        self.stop = start
+        self.vocab = {}
+        self.token_ids = array('i')
+        self.row_ids = array('i')
+
+    def add(self, store: ReviewStore) -> None:
+        """Index the rows of ``store``, which follow the rows added so far"""
+        vocab = self.vocab
+        for row, text in enumerate(store.content, self.stop):
+            if not text:
+                continue
+            ids = [vocab.setdefault(token, len(vocab)) for token in set(TOKEN_PATTERN.findall(text.lower()))]
+            self.token_ids.extend(ids)
+            self.row_ids.extend([row] * len(ids))
+        self.stop += len(store)
+
+    def index(self) -> InvertedIndex:
+        segment = _Segment.from_pairs(self.start, self.stop, self.vocab,
+                                      np.frombuffer(self.token_ids, dtype=np.int32),
+                                      np.frombuffer(self.row_ids, dtype=np.int32))
+        return InvertedIndex([segment])
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Token frequencies for common_topics.
+
+Review tokens other than config.STOPWORDS are counted once per dataset. By
+default every token is counted exactly in a Counter. With config.TOPICS_MODE
+set to "approximate", a CountMinTopK keeps memory fixed instead: a Count-Min
+Sketch of all counts plus the most frequent candidates. Either kind of counts
+is mergeable and is turned into a TokenTable sorted by frequency, so answering
+a query only slices it.
+"""
+
+import hashlib
+import heapq
+import re
+from collections import Counter
+
+import numpy as np
+
+import config
+
+# Tokenizer used for topic counts
+WORD_PATTERN = re.compile(r'\b[a-z]+\b')
+
+# Reviews tokenized per regex call
+CHUNK_ROWS = 10_000
+
+
+class CountMinTopK:
+    """Approximate token counts in bounded memory
+
+    Counts go into a ``depth`` x ``width`` Count-Min Sketch, whose estimates
+    never undercount and overcount by at most a few times total / width. The
+    ``k`` tokens with the highest estimates are kept as candidates for top-k
+    queries. Supports the parts of the Counter interface the aggregates use.
+    """
+
+    def __init__(self, width: int, depth: int, k: int):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Candidate token -> estimated count, highest first
+        self.candidates = {}
+
+    def _columns(self, tokens: list) -> np.ndarray:
+        """(len(tokens), depth) sketch columns, from independent 32-bit slices of one hash"""
+        digests = b''.join(hashlib.blake2b(token.encode('utf-8'), digest_size=4 * self.depth).digest()
+                           for token in tokens)
+        hashes = np.frombuffer(digests, dtype='<u4').reshape(len(tokens), self.depth)
+        return (hashes % self.width).astype(np.intp)
+
+    def estimate(self, tokens: list) -> np.ndarray:
+        """Estimated counts of ``tokens``"""
+        if not tokens:
+            return np.empty(0, dtype=np.int64)
+        return self.table[np.arange(self.depth), self._columns(tokens)].min(axis=1)
+
+    def update(self, counts) -> None:
+        """Add a mapping of token counts, or another sketch of the same shape"""
+        if isinstance(counts, CountMinTopK):
+            self.table += counts.table
+            tokens = set(counts.candidates)
+        else:
+            tokens = list(counts)
+            if not tokens:
+                return
+            values = np.fromiter(counts.values(), dtype=np.int64, count=len(tokens))
+            columns = self._columns(tokens)
+            for row in range(self.depth):
+                np.add.at(self.table[row], columns[:, row], values)
+        candidates = list(set(self.candidates).union(tokens))
+        estimates = self.estimate(candidates).tolist()
+        self.candidates = {token: count for count, token in heapq.nlargest(self.k, zip(estimates, candidates))}
+
+    def copy(self) -> "CountMinTopK":
+        sketch = CountMinTopK(self.width, self.depth, self.k)
+        sketch.table = self.table.copy()
+        sketch.candidates = dict(self.candidates)
+        return sketch
+
+    def items(self):
+        return self.candidates.items()
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+
+def new_counts():
+    """Empty token counts of the kind selected by config.TOPICS_MODE"""
+    if config.TOPICS_MODE == "approximate":
+        return CountMinTopK(config.TOPICS_SKETCH_WIDTH, config.TOPICS_SKETCH_DEPTH, config.TOPICS_TOP_K)
+    return Counter()
+
+
+def count_tokens(texts, counts) -> None:
+    """Add the lowercased non-stopword tokens of ``texts`` to ``counts``
+
+    Texts are tokenized CHUNK_ROWS at a time, so each regex call covers many
+    reviews and an approximate ``counts`` never sees more than one chunk's
+    tokens at once.
+    """
+    chunk = []
+    for text in texts:
+        if text:
+            chunk.append(text)
+        if len(chunk) == CHUNK_ROWS:
+            _count_chunk(chunk, counts)
+            chunk = []
+    if chunk:
+        _count_chunk(chunk, counts)
+
+
+def _count_chunk(texts: list, counts) -> None:
+    stopwords = config.STOPWORDS
+    tokens = WORD_PATTERN.findall('\n'.join(texts).lower())
+    counts.update(Counter(token for token in tokens if token not in stopwords))
+
+
+class TokenTable:
+    """Token counts sorted by decreasing count (ties in first-seen order)"""
+
+    def __init__(self, tokens: list, counts: np.ndarray, approximate: bool = False):
+        self.tokens = tokens
+        self.counts = counts
+        self.lengths = np.array([len(token) for token in tokens], dtype=np.int64)
+        self.approximate = approximate
+        # Number of distinct tokens per length
+        self.length_counts = np.bincount(self.lengths)
+
+    @classmethod
+    def from_counts(cls, counts) -> "TokenTable":
+        """Table of a Counter or CountMinTopK"""
+        tokens = list(counts.items())
+        values = np.array([count for _, count in tokens], dtype=np.int64)
+        order = np.argsort(-values, kind='stable')
+        return cls([tokens[i][0] for i in order], values[order], isinstance(counts, CountMinTopK))
+
+    def top(self, limit: int, min_length: int = 1) -> list:
+        """The ``limit`` most frequent (token, count) pairs of at least ``min_length`` characters"""
+        rows = np.flatnonzero(self.lengths >= min_length)[:max(limit, 0)]
+        return [(self.tokens[i], int(self.counts[i])) for i in rows]
+
+    def unique(self, min_length: int = 1) -> int:
+        """Number of distinct tokens of at least ``min_length`` characters"""
+        return int(self.length_counts[max(min_length, 0):].sum())
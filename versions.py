@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Semantic ordering of app versions.
+
+appVersion values such as "8.120.0 build 10 50520" are parsed once per
+dataset into (major, minor, patch, build, code) tuples, so versions compare
+numerically ("8.100" comes after "8.99") instead of as strings. The index
+keeps the appVersion codes in version order, answers version ranges with
+two binary searches, and maps every code to its group at each rollup level,
+so per-version aggregates roll up with one bincount. Values that do not
+parse (including blanks) are in no range and no group.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Optional
+
+import numpy as np
+
+# major[.minor[.patch[ build N[ code]]]]
+VERSION_PATTERN = re.compile(r'(\d+)(?:\.(\d+)(?:\.(\d+)(?:\s+build\s+(\d+)(?:\s+(\d+))?)?)?)?', re.IGNORECASE)
+
+# Leading version components that identify a group at each rollup level
+LEVELS = {'major': 1, 'minor': 2, 'build': 5}
+
+
+def parse_version(text: str) -> Optional[tuple[int, ...]]:
+    """Components of a version, e.g. "8.120.0 build 10 50520" -> (8, 120, 0, 10, 50520)
+
+    Only the components present are returned ("8.100" -> (8, 100)); None
+    when ``text`` is not a version.
+    """
+    match = VERSION_PATTERN.fullmatch(text.strip())
+    if match is None:
+        return None
+    return tuple(int(part) for part in match.groups() if part is not None)
+
+
+def format_version(key: tuple[int, ...]) -> str:
+    """Inverse of parse_version"""
+    text = ".".join(str(part) for part in key[:3])
+    if len(key) > 3:
+        text += " build " + " ".join(str(part) for part in key[3:])
+    return text
+
+
+def _bound(text: str) -> tuple[int, ...]:
+    key = parse_version(str(text))
+    if key is None:
+        raise ValueError(f"Invalid version: {text!r}")
+    return key
+
+
+class VersionIndex:
+    """appVersion codes of one store in semantic version order, with their rollup groups"""
+
+    def __init__(self, names):
+        self.names = names
+        keys = [parse_version(name) for name in names]
+        self.size = len(keys)
+        # Parsed codes, oldest version first, and their keys in the same order
+        self.order = np.array(sorted((code for code, key in enumerate(keys) if key is not None),
+                                     key=lambda code: keys[code]), dtype=np.int64)
+        self.sorted_keys = [keys[code] for code in self.order]
+        # Per level: group id of every code (-1 when unparsed) and group labels, oldest first
+        self.group_ids = {}
+        self.group_labels = {}
+        for level, length in LEVELS.items():
+            ids = np.full(self.size, -1, dtype=np.int64)
+            labels = []
+            for code, key in zip(self.order, self.sorted_keys):
+                label = format_version(key[:length])
+                if not labels or labels[-1] != label:
+                    labels.append(label)
+                ids[code] = len(labels) - 1
+            self.group_ids[level] = ids
+            self.group_labels[level] = labels
+
+    def parsed(self) -> np.ndarray:
+        """Boolean mask over codes whose name is a version"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order] = True
+        return mask
+
+    def range(self, since: Optional[str] = None, until: Optional[str] = None) -> np.ndarray:
+        """Boolean mask over codes from ``since`` to ``until``, both inclusive at their own precision
+
+        ``until="8.120"`` includes every 8.120.x; either bound may be None.
+        """
+        lo = 0 if since is None else bisect_left(self.sorted_keys, _bound(since))
+        if until is None:
+            hi = len(self.sorted_keys)
+        else:
+            # One past the last component given: "8.120" ends before "8.121"
+            key = _bound(until)
+            hi = bisect_left(self.sorted_keys, key[:-1] + (key[-1] + 1,))
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order[lo:hi]] = True
+        return mask
+
+    def rollup(self, level: str, reviews: np.ndarray, rated: np.ndarray, score_sum: np.ndarray,
+               prior_weight: float) -> dict:
+        """Per-code review counts, rated counts and score sums summed into the groups of ``level``
+
+        Returns arrays indexed by group (oldest first): 'labels', 'reviews',
+        'rated', 'average' (raw mean score, NaN without ratings) and
+        'weighted' (Bayesian average: the overall mean score of all codes
+        counts as ``prior_weight`` extra ratings, so thinly rated groups stay
+        near it). 'prior' is that overall mean.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        ids = self.group_ids[level]
+        grouped = ids >= 0
+        n = len(self.group_labels[level])
+
+        def total(values):
+            return np.bincount(ids[grouped], weights=values[grouped], minlength=n)
+
+        group_rated = total(rated)
+        group_scores = total(score_sum)
+        all_rated = rated.sum()
+        prior = float(score_sum.sum() / all_rated) if all_rated else 0.0
+        return {
+            'labels': self.group_labels[level],
+            'reviews': total(reviews).astype(np.int64),
+            'rated': group_rated.astype(np.int64),
+            'average': np.divide(group_scores, group_rated, out=np.full(n, np.nan), where=group_rated > 0),
+            'weighted': (group_scores + prior_weight * prior) / (group_rated + prior_weight),
+            'prior': prior,
+        }